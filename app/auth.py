@@ -6,6 +6,8 @@ from app.config import SECRET_KEY
 from app.models import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
+# Même schéma, mais sans erreur 401 quand le token est absent (routes publiques)
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login", auto_error=False)
 
 def hash_password(password: str) -> str:
     """ Hashage du mot de passe avec SHA-256 """
@@ -62,6 +64,12 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     
     return user
 
+async def get_optional_user(token: str = Depends(optional_oauth2_scheme)):
+    """ Utilisateur connecté si un token est fourni, None sinon """
+    if not token:
+        return None
+    return await get_current_user(token)
+
 async def get_current_seller(current_user: User = Depends(get_current_user)):
     if current_user.status != "farmer":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have access to this resource.")
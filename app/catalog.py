@@ -0,0 +1,90 @@
+# app/catalog.py
+import time
+from collections import OrderedDict, defaultdict
+from tortoise.expressions import Case, When
+from tortoise.functions import Count
+from app.config import CATALOG_PRICE_BUCKETS, CATALOG_CACHE_TTL, CATALOG_CACHE_MAX_ENTRIES
+
+# Tris proposés : clés de pagination (le dernier champ est id)
+SORTS = {
+    "newest": ("-id",),
+    "price": ("price", "id"),
+    "-price": ("-price", "-id"),
+    "name": ("name", "id"),
+}
+
+
+def price_bucket(bounds=CATALOG_PRICE_BUCKETS):
+    """ Numéro de la tranche de prix, calculé en SQL : 0 sous la première borne, len(bounds) au-dessus de la dernière """
+    return Case(*[When(price__lt=bound, then=i) for i, bound in enumerate(bounds)], default=len(bounds))
+
+
+async def catalog_facets(query, city: str = None, bounds=CATALOG_PRICE_BUCKETS) -> dict:
+    """
+    Nombre de produits par ville et par tranche de prix, en une requête
+    (GROUP BY ville, tranche). `query` porte les filtres hors ville : les
+    comptes par ville ignorent la ville choisie, les comptes par tranche en
+    tiennent compte.
+    """
+    rows = await query.annotate(bucket=price_bucket(bounds), count=Count("id")).group_by("city", "bucket").values("city", "bucket", "count")
+
+    cities = defaultdict(int)
+    buckets = [0] * (len(bounds) + 1)
+    for row in rows:
+        cities[row["city"]] += row["count"]
+        if city is None or row["city"] == city:
+            buckets[row["bucket"]] += row["count"]
+
+    edges = [None] + list(bounds) + [None]
+    return {
+        "city": [{"value": value, "count": count} for value, count in sorted(cities.items(), key=lambda item: (-item[1], item[0]))],
+        "price": [{"min": edges[i], "max": edges[i + 1], "count": count} for i, count in enumerate(buckets)],
+    }
+
+
+class CatalogCache:
+    """
+    Cache (lecture seule, LRU avec TTL) des pages du catalogue, par filtres.
+
+    Vidé à chaque création, modification ou suppression de produit et à chaque
+    changement de stock (commandes) dans ce processus ; les autres processus
+    de l'API voient le changement à l'expiration (CATALOG_CACHE_TTL).
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL, max_entries: int = CATALOG_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # filtres -> (expires_at, page)
+        self.generation = 0  # incrémenté à chaque invalidation
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.time():
+            self.entries.pop(key, None)
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def put(self, key, value, generation: int):
+        # Page calculée avant une invalidation : elle peut déjà être périmée
+        if self.ttl <= 0 or generation != self.generation:
+            return
+        self.entries[key] = (time.time() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self):
+        self.generation += 1
+        self.entries.clear()
+        self.stats["invalidations"] += 1
+
+    @property
+    def info(self):
+        return {**self.stats, "entries": len(self.entries)}
+
+
+catalog_cache = CatalogCache()
@@ -1,4 +1,5 @@
 from dotenv import load_dotenv
+import json
 import os
 
 
@@ -7,3 +8,119 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "3ad36a2896073281ea99a646c88753f3942bdf4ff7d37a5500287da24bbd78da")
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 15
 
+
+# Envoi des emails (SMTP)
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+# Identifiants uniquement par l'environnement (ou .env), jamais dans le code
+SMTP_USER = os.getenv("SMTP_USER", "")  # vide = pas d'authentification
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+MAIL_FROM = os.getenv("MAIL_FROM", SMTP_USER or "no-reply@kakao-farmer.local")
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", "1000"))
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", "2"))  # = nombre de connexions SMTP persistantes
+MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", "3"))
+MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", "1.0"))  # secondes, doublé à chaque essai
+MAIL_FLUSH_TIMEOUT = float(os.getenv("MAIL_FLUSH_TIMEOUT", "10"))
+
+# Regroupement des notifications (digest)
+NOTIFICATION_DIGEST_WINDOW = float(os.getenv("NOTIFICATION_DIGEST_WINDOW", "60"))  # secondes, 0 = désactivé
+NOTIFICATION_URGENT_EVENTS = set(
+    e.strip() for e in os.getenv("NOTIFICATION_URGENT_EVENTS", "order_confirmed,order_validated").split(",") if e.strip()
+)
+NOTIFICATION_MAX_BUFFER = int(os.getenv("NOTIFICATION_MAX_BUFFER", "10000"))  # notifications gardées si la base est indisponible
+
+# Réglages mesurés par python -m benchmarks.autotune ; les variables d'environnement restent prioritaires
+INFERENCE_TUNING_FILE = os.getenv("INFERENCE_TUNING_FILE", "inference_tuning.json")
+INFERENCE_TUNING = {}
+if INFERENCE_TUNING_FILE and os.path.exists(INFERENCE_TUNING_FILE):
+    try:
+        with open(INFERENCE_TUNING_FILE) as f:
+            INFERENCE_TUNING = json.load(f).get("config", {})
+    except (OSError, ValueError) as e:
+        print(f"Ignoring {INFERENCE_TUNING_FILE}: {e}")
+
+# Détection de maladies : regroupement des inférences (micro-batching)
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", str(INFERENCE_TUNING.get("max_batch_size", 8))))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", str(INFERENCE_TUNING.get("max_wait_ms", 5))))
+INFERENCE_BATCH_BUCKETS = int(os.getenv("INFERENCE_BATCH_BUCKETS", "2"))  # interpréteurs par emplacement du pool (batch de 1, 2, 4... et le maximum)
+INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", str(INFERENCE_TUNING.get("pool_size", os.cpu_count() or 1))))  # interpréteurs TFLite
+INFERENCE_NUM_THREADS = int(os.getenv("INFERENCE_NUM_THREADS", str(INFERENCE_TUNING.get("num_threads", 1))))  # threads par interpréteur
+INFERENCE_XNNPACK = os.getenv("INFERENCE_XNNPACK", "1" if INFERENCE_TUNING.get("xnnpack", True) else "0") == "1"  # délégué CPU XNNPACK
+INFERENCE_RESIZE_FILTER = os.getenv("INFERENCE_RESIZE_FILTER", "bilinear")  # nearest, bilinear, bicubic, lanczos...
+
+# Cache des prédictions (clé = hash du fichier envoyé)
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "10000"))
+PREDICTION_CACHE_MAX_BYTES = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", str(24 * 3600)))  # secondes
+PREDICTION_CACHE_DB = os.getenv("PREDICTION_CACHE_DB", "")  # fichier SQLite du cache disque, vide = désactivé
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "auto")  # auto, tflite_runtime, tensorflow, numpy
+MODELS_DIR = os.getenv("MODELS_DIR", "models")  # versions du modèle : models/<version>.tflite
+MODEL_POLL_INTERVAL = float(os.getenv("MODEL_POLL_INTERVAL", "30"))  # secondes entre deux scans de MODELS_DIR
+
+# Contrôle d'admission de /models/predict
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "64"))  # prédictions en cours ou en attente
+INFERENCE_MAX_PER_CLIENT = int(os.getenv("INFERENCE_MAX_PER_CLIENT", "4"))  # prédictions simultanées par client
+# Reverse proxies (IP ou réseau CIDR) dont on accepte l'en-tête X-Forwarded-For ; vide = adresse de connexion seule
+TRUSTED_PROXIES = [p.strip() for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip()]
+
+# Réception des images envoyées
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))  # taille max d'une image
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))  # au-delà, l'upload passe sur disque
+UPLOAD_MAX_PIXELS = int(os.getenv("UPLOAD_MAX_PIXELS", str(50_000_000)))  # protection contre les "decompression bombs"
+UPLOAD_ALLOWED_FORMATS = set(
+    f.strip().upper() for f in os.getenv("UPLOAD_ALLOWED_FORMATS", "JPEG,MPO,PNG,WEBP").split(",") if f.strip()
+)
+
+# Relevés terrain : archive (zip) ou lot d'images analysés en tâche de fond
+SURVEY_MAX_BYTES = int(os.getenv("SURVEY_MAX_BYTES", str(500 * 1024 * 1024)))  # taille max d'un envoi
+SURVEY_MAX_IMAGES = int(os.getenv("SURVEY_MAX_IMAGES", "2000"))  # images analysées au plus par relevé
+SURVEY_BATCH_SIZE = int(os.getenv("SURVEY_BATCH_SIZE", str(INFERENCE_MAX_BATCH_SIZE)))  # images décodées à la fois
+SURVEY_MAX_RUNNING = int(os.getenv("SURVEY_MAX_RUNNING", "1"))  # relevés analysés en parallèle
+SURVEY_JOB_TTL = float(os.getenv("SURVEY_JOB_TTL", str(24 * 3600)))  # durée de conservation des résultats (secondes)
+SURVEY_MAX_JOBS = int(os.getenv("SURVEY_MAX_JOBS", "100"))  # relevés terminés gardés en mémoire
+
+# Processus d'inférence partagé (python -m app.ml.worker) ; vide = interpréteurs dans le processus de l'API
+INFERENCE_WORKER_ADDRESS = os.getenv("INFERENCE_WORKER_ADDRESS", "")  # chemin du socket Unix ou host:port
+INFERENCE_WORKER_AUTHKEY = os.getenv("INFERENCE_WORKER_AUTHKEY", "")  # obligatoire avec INFERENCE_WORKER_ADDRESS, distinct de SECRET_KEY
+
+# Historique des prédictions (écriture différée par lots)
+PREDICTION_HISTORY_FLUSH_INTERVAL = float(os.getenv("PREDICTION_HISTORY_FLUSH_INTERVAL", "5"))  # secondes, 0 = désactivé
+PREDICTION_HISTORY_BATCH_SIZE = int(os.getenv("PREDICTION_HISTORY_BATCH_SIZE", "500"))  # lignes par bulk_create
+PREDICTION_HISTORY_MAX_BUFFER = int(os.getenv("PREDICTION_HISTORY_MAX_BUFFER", "50000"))  # lignes gardées si la base est indisponible
+
+# Factures PDF (générées en arrière-plan dans un pool de processus)
+INVOICE_WORKERS = int(os.getenv("INVOICE_WORKERS", "2"))  # processus de rendu
+INVOICE_BATCH_SIZE = int(os.getenv("INVOICE_BATCH_SIZE", "50"))  # factures par appel au pool
+INVOICE_MAX_ATTEMPTS = int(os.getenv("INVOICE_MAX_ATTEMPTS", "3"))  # reprises d'une facture en échec
+INVOICE_RETRY_INTERVAL = float(os.getenv("INVOICE_RETRY_INTERVAL", "300"))  # secondes entre deux reprises, 0 = au démarrage seulement
+INVOICE_DIR = os.getenv("INVOICE_DIR", "orders")  # ancien dossier des factures, encore lu pour les anciennes commandes
+
+# Stockage des fichiers générés (factures)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_DIR = os.getenv("STORAGE_DIR", "storage")
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")  # préfixe des liens envoyés par email
+
+# Idempotency-Key sur les commandes : réponses gardées en mémoire (LRU) et en base
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))  # durée de conservation d'une réponse (secondes)
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))  # réponses gardées en mémoire
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))  # attente max d'une requête identique en cours (secondes)
+IDEMPOTENCY_LOCK_TTL = float(os.getenv("IDEMPOTENCY_LOCK_TTL", "30"))  # verrou d'une requête en cours, prolongé tant qu'elle tourne (secondes)
+
+# État "liké par moi" des posts, gardé en mémoire par utilisateur
+LIKES_CACHE_TTL = float(os.getenv("LIKES_CACHE_TTL", "60"))  # secondes (un like fait dans un autre processus est vu après ce délai)
+LIKES_CACHE_MAX_USERS = int(os.getenv("LIKES_CACHE_MAX_USERS", "10000"))
+LIKES_CACHE_MAX_POSTS = int(os.getenv("LIKES_CACHE_MAX_POSTS", "5000"))  # posts connus par utilisateur
+
+# Pagination des listes (curseur, voir app/pagination.py)
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "50"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "200"))
+
+# Recherche de posts et produits : auto = PostgreSQL (tsvector, trigrammes) si disponible, sinon index en mémoire
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")  # auto, postgres, memory
+
+# Catalogue public des produits (filtres, facettes, cache)
+CATALOG_PRICE_BUCKETS = [float(v) for v in os.getenv("CATALOG_PRICE_BUCKETS", "500,1000,2500,5000,10000").split(",") if v.strip()]  # bornes des tranches de prix
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))  # secondes, 0 = pas de cache
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1000"))
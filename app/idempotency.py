@@ -0,0 +1,209 @@
+# app/idempotency.py
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from tortoise.exceptions import IntegrityError
+from app.config import IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_WAIT_TIMEOUT, IDEMPOTENCY_LOCK_TTL
+from app.models import IdempotencyRecord
+
+# Intervalle de lecture de la base quand la requête d'origine tourne dans un autre processus
+POLL_INTERVAL = 0.1
+
+# Essais d'enregistrement d'une réponse que la route n'a pas enregistrée elle-même
+SAVE_ATTEMPTS = 3
+
+
+async def no_commit(result, using_db=None):
+    """ commit() passé aux routes appelées sans en-tête Idempotency-Key """
+
+
+class IdempotencyStore:
+    """
+    Réponses des requêtes envoyées avec un en-tête Idempotency-Key.
+
+    Une requête renvoyée avec la même clé (même utilisateur) reçoit la réponse
+    enregistrée, sans exécuter la route une seconde fois. Les réponses sont
+    gardées en mémoire (LRU avec TTL) et dans la table idempotency_records,
+    partagée par les processus de l'API. Un doublon qui arrive pendant que la
+    requête d'origine s'exécute attend sa réponse.
+
+    Seules les réponses réussies sont enregistrées : après une erreur, la clé
+    est libérée et la requête peut être réessayée.
+
+    La route reçoit commit(réponse, using_db) et l'appelle dans sa propre
+    transaction : la réponse est enregistrée avec la commande, ou pas du tout.
+    Si le verrou a été perdu entre-temps (repris par un autre processus),
+    commit lève une 409 et la transaction de la route est annulée.
+
+    Une ligne en cours (status_code vide) n'expire qu'après lock_ttl secondes,
+    délai prolongé tant que la requête tourne : si le processus meurt, un
+    doublon reprend la clé peu après au lieu d'attendre le TTL des réponses.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+                 wait_timeout: float = IDEMPOTENCY_WAIT_TIMEOUT, lock_ttl: float = IDEMPOTENCY_LOCK_TTL):
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.entries = OrderedDict()  # (user_id, key) -> (expires_at, fingerprint, status_code, body)
+        self.inflight = {}  # (user_id, key) -> Future résolue à la fin de la requête d'origine
+        self.stats = {"executed": 0, "replayed": 0, "waited": 0}
+
+    @staticmethod
+    async def fingerprint(request: Request) -> str:
+        body = await request.body()
+        return hashlib.sha256(request.method.encode() + b" " + request.url.path.encode() + b"\n" + body).hexdigest()
+
+    def get(self, scope):
+        entry = self.entries.get(scope)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self.entries[scope]
+            return None
+        self.entries.move_to_end(scope)
+        return entry
+
+    def put(self, scope, entry):
+        self.entries[scope] = entry
+        self.entries.move_to_end(scope)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def replay(self, entry, fingerprint: str):
+        expires_at, stored_fingerprint, status_code, body = entry
+        if stored_fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key already used for a different request")
+        self.stats["replayed"] += 1
+        return JSONResponse(body, status_code=status_code, headers={"Idempotent-Replayed": "true"})
+
+    async def run(self, request: Request, user, handler):
+        """ Exécute handler(commit) une seule fois par clé ; sans en-tête Idempotency-Key, l'exécute simplement """
+        key = request.headers.get("idempotency-key")
+        if key is None:
+            return await handler(no_commit)
+        if not key or len(key) > 255:
+            raise HTTPException(status_code=400, detail="Invalid Idempotency-Key")
+
+        fingerprint = await self.fingerprint(request)
+        scope = (user.id, key)
+        while True:
+            entry = self.get(scope)
+            if entry is not None:
+                return self.replay(entry, fingerprint)
+            future = self.inflight.get(scope)
+            if future is None:
+                break
+            # Même clé en cours dans ce processus : attendre sa réponse (ou sa libération après une erreur)
+            self.stats["waited"] += 1
+            await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[scope] = future
+        try:
+            return await self._execute(scope, fingerprint, handler)
+        finally:
+            del self.inflight[scope]
+            future.set_result(None)
+
+    async def _execute(self, scope, fingerprint, handler):
+        user_id, key = scope
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            now = datetime.now(timezone.utc)
+            record = await IdempotencyRecord.filter(user_id=user_id, key=key, expires_at__gt=now).first()
+            if record is None:
+                try:
+                    # La contrainte unique (user_id, key) départage les processus
+                    record = await IdempotencyRecord.create(user_id=user_id, key=key, fingerprint=fingerprint,
+                                                            expires_at=now + timedelta(seconds=self.lock_ttl))
+                    break
+                except IntegrityError:
+                    # Ligne expirée (réponse trop ancienne ou verrou d'un processus arrêté), ou créée à l'instant ailleurs
+                    await IdempotencyRecord.filter(user_id=user_id, key=key, expires_at__lte=now).delete()
+                    continue
+
+            if record.status_code is not None:
+                entry = (record.expires_at.timestamp(), record.fingerprint, record.status_code, json.loads(record.response))
+                self.put(scope, entry)
+                return self.replay(entry, fingerprint)
+            if record.fingerprint != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key already used for a different request")
+            if time.monotonic() > deadline:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            self.stats["waited"] += 1
+            await asyncio.sleep(POLL_INTERVAL)
+
+        committed = []
+
+        async def commit(result, using_db=None):
+            if not await self._store(record.id, jsonable_encoder(result), using_db):
+                # Verrou expiré et repris ailleurs : l'exception annule la transaction de la route
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            committed.append(True)
+
+        heartbeat = asyncio.create_task(self._keep_lock(record.id))
+        try:
+            try:
+                result = await handler(commit)
+            except BaseException:
+                # Réponse non enregistrée (ou annulée avec la transaction) : la clé peut être réutilisée pour réessayer
+                await IdempotencyRecord.filter(id=record.id, status_code=None).delete()
+                raise
+            body = jsonable_encoder(result)
+            if not committed:
+                # Route sans transaction : le verrou reste prolongé pendant les essais
+                await self._store_with_retries(record.id, key, body)
+        finally:
+            heartbeat.cancel()
+
+        self.put(scope, (time.time() + self.ttl, fingerprint, 200, body))
+        self.stats["executed"] += 1
+        return JSONResponse(body)
+
+    async def _store(self, record_id, body, using_db=None) -> bool:
+        """ Enregistre la réponse sur la ligne en cours ; False si elle n'est plus à nous """
+        updated = await IdempotencyRecord.filter(id=record_id, status_code=None).using_db(using_db).update(
+            status_code=200, response=json.dumps(body),
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.ttl))
+        return updated == 1
+
+    async def _store_with_retries(self, record_id, key, body):
+        for attempt in range(SAVE_ATTEMPTS):
+            try:
+                if not await self._store(record_id, body):
+                    print(f"Idempotency-Key {key} was taken over before its response could be stored")
+                return
+            except Exception as e:
+                print(f"Failed to store the response for Idempotency-Key {key} (attempt {attempt + 1}): {e}")
+            if attempt + 1 < SAVE_ATTEMPTS:
+                await asyncio.sleep(POLL_INTERVAL * 2 ** attempt)
+        # La route a déjà fait son effet : renvoyer sa réponse plutôt qu'une erreur qui pousserait à réessayer
+
+    async def _keep_lock(self, record_id):
+        """ Prolonge le verrou de la ligne en cours tant que la requête tourne """
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                await IdempotencyRecord.filter(id=record_id, status_code=None).update(
+                    expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.lock_ttl))
+            except Exception as e:
+                print(f"Failed to extend the idempotency lock {record_id}: {e}")
+
+    async def purge(self):
+        """ Supprime les réponses expirées de la table """
+        return await IdempotencyRecord.filter(expires_at__lte=datetime.now(timezone.utc)).delete()
+
+    @property
+    def info(self):
+        return {**self.stats, "entries": len(self.entries), "inflight": len(self.inflight)}
+
+
+idempotency = IdempotencyStore()
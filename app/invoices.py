@@ -0,0 +1,213 @@
+# app/invoices.py
+import asyncio
+import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fpdf import FPDF
+from tortoise.expressions import Q
+from app.config import INVOICE_WORKERS, INVOICE_BATCH_SIZE, INVOICE_MAX_ATTEMPTS, INVOICE_RETRY_INTERVAL, PUBLIC_BASE_URL
+from app.models import Order
+from app.notifier import notifier
+from app.storage import storage
+
+## Rendu (exécuté dans les processus du pool)
+
+# Page d'en-tête construite une fois par processus, copiée pour chaque facture
+_template = None
+
+
+def build_template():
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(200, 12, "Kakao Farmer - Invoice", ln=True)
+    pdf.set_font("Arial", size=12)
+    return pdf
+
+
+def _text(value) -> str:
+    # Polices de base FPDF : latin-1 uniquement
+    return str(value).encode("latin-1", "replace").decode("latin-1")
+
+
+def render_invoice(invoice: dict) -> bytes:
+    """ PDF d'une facture, généré en mémoire """
+    global _template
+    if _template is None:
+        _template = build_template()
+    pdf = copy.deepcopy(_template)
+    pdf.cell(200, 10, _text(f"Invoice #{invoice['order_id']} - {invoice['date']}"), ln=True)
+    pdf.cell(200, 10, _text(f"Buyer Name: {invoice['buyer']}"), ln=True)
+    pdf.cell(200, 10, _text(f"Product Name: {invoice['product']}"), ln=True)
+    pdf.cell(200, 10, _text(f"Quantity: {invoice['quantity']}"), ln=True)
+    pdf.cell(200, 10, _text(f"Total Price: {invoice['total_price']}"), ln=True)
+    pdf.cell(200, 10, _text(f"Seller Name: {invoice['seller']}"), ln=True)
+    pdf.cell(200, 10, _text(f"Seller Email: {invoice['seller_email']}"), ln=True)
+
+    output = pdf.output(dest="S")
+    # fpdf 1.x renvoie une str latin-1, fpdf2 un bytearray
+    return output.encode("latin-1") if isinstance(output, str) else bytes(output)
+
+
+def render_invoices(invoices: list) -> list:
+    """ Mode groupé : plusieurs factures en un seul appel au pool """
+    return [render_invoice(invoice) for invoice in invoices]
+
+
+## Génération en arrière-plan
+
+def invoice_key(order_id: int) -> str:
+    """ Clé de la facture dans le stockage (voir app/storage.py) """
+    return f"invoices/{order_id}.pdf"
+
+
+def invoice_url(order_id: int) -> str:
+    return f"{PUBLIC_BASE_URL}/orders/{order_id}/invoice"
+
+
+def store_invoices(files):
+    for key, data in files:
+        storage.put(key, data)
+
+
+class InvoiceRenderer:
+    """
+    Factures générées hors de la boucle asyncio, dans un pool de processus.
+
+    Les commandes validées sont mises en file ; les commandes en attente sont
+    rendues par lots (une seule tâche envoyée au pool par lot). Quand le PDF
+    est écrit, la commande passe à invoice_status="ready" et l'acheteur est
+    notifié. Une facture en échec est reprise au démarrage puis toutes les
+    retry_interval secondes, au plus max_attempts fois ; après le dernier
+    échec, l'acheteur est notifié une seule fois, sans facture.
+    """
+
+    def __init__(self, workers: int = INVOICE_WORKERS, batch_size: int = INVOICE_BATCH_SIZE,
+                 max_attempts: int = INVOICE_MAX_ATTEMPTS, retry_interval: float = INVOICE_RETRY_INTERVAL):
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_interval = retry_interval
+        self.pending = []  # ids de commandes
+        self.queued = set()  # ids en file ou en cours de rendu
+        self.wakeup = asyncio.Event()
+        self.executor = None
+        self.task = None
+        self.stats = {"rendered": 0, "failed": 0, "batches": 0, "errors": 0, "retried": 0}
+
+    def start(self):
+        if self.task is None:
+            # spawn : pas de fork d'un processus qui a déjà des threads (mailer, pool d'inférence)
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self.task = asyncio.create_task(self._run())
+
+    def enqueue(self, order_ids):
+        order_ids = [order_id for order_id in order_ids if order_id not in self.queued]
+        self.queued.update(order_ids)
+        self.pending.extend(order_ids)
+        self.wakeup.set()
+
+    async def resume(self, pending: bool = True):
+        """
+        Remet en file les factures en échec qui ont encore des essais et, au
+        démarrage (pending=True), celles qui n'ont pas été générées avant un arrêt.
+        Chaque reprise est réservée par un UPDATE conditionnel sur
+        invoice_attempts : un seul processus de l'API reprend une commande donnée.
+        """
+        statuses = Q(invoice_status="failed") | Q(invoice_status="pending") if pending else Q(invoice_status="failed")
+        rows = await Order.filter(statuses, invoice_attempts__lt=self.max_attempts).values_list("id", "invoice_attempts")
+        claimed = []
+        for order_id, attempts in rows:
+            if order_id in self.queued:
+                continue
+            if await Order.filter(id=order_id, invoice_attempts=attempts).update(invoice_attempts=attempts + 1):
+                claimed.append(order_id)
+        if claimed:
+            self.stats["retried"] += len(claimed)
+            self.enqueue(claimed)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.retry_interval or None)
+            except asyncio.TimeoutError:
+                try:
+                    await self.resume(pending=False)
+                except Exception as e:
+                    print(f"Failed to resume invoices: {e}")
+            self.wakeup.clear()
+            while self.pending:
+                order_ids, self.pending = self.pending, []
+                # Les lots partent en parallèle sur les processus du pool
+                size = min(self.batch_size, -(-len(order_ids) // self.workers))
+                batches = [order_ids[i:i + size] for i in range(0, len(order_ids), size)]
+                await asyncio.gather(*(self._render_safely(batch) for batch in batches))
+
+    async def _render_safely(self, order_ids):
+        """ Une erreur sur un lot (base, stockage) ne doit pas arrêter la boucle de rendu """
+        try:
+            await self.render_batch(order_ids)
+        except Exception as e:
+            print(f"Failed to render invoices {order_ids}: {e}")
+            self.stats["errors"] += 1
+            try:
+                # Reprises par resume() à l'intervalle suivant
+                await Order.filter(id__in=order_ids, invoice_status="pending").update(invoice_status="failed")
+            except Exception as e:
+                print(f"Failed to mark invoices {order_ids} as failed: {e}")
+        finally:
+            self.queued.difference_update(order_ids)
+
+    async def render_batch(self, order_ids):
+        self.stats["batches"] += 1
+        orders = await Order.filter(id__in=order_ids).prefetch_related("product__seller", "user")
+        invoices = [{
+            "order_id": order.id,
+            "date": order.created_at.strftime("%Y-%m-%d"),
+            "buyer": order.user.username,
+            "product": order.product.name,
+            "quantity": order.quantity,
+            "total_price": order.total_price,
+            "seller": order.product.seller.username,
+            "seller_email": order.product.seller.email,
+        } for order in orders]
+
+        try:
+            loop = asyncio.get_running_loop()
+            pdfs = await loop.run_in_executor(self.executor, render_invoices, invoices)
+            keys = [invoice_key(order.id) for order in orders]
+            await asyncio.to_thread(store_invoices, list(zip(keys, pdfs)))
+        except Exception as e:
+            print(f"Failed to render invoices {order_ids}: {e}")
+            self.stats["failed"] += len(orders)
+            await Order.filter(id__in=[order.id for order in orders]).update(invoice_status="failed")
+            for order in orders:
+                # Notification sans facture au dernier essai seulement : avant, une reprise réussie enverra le lien.
+                # resume() ne reprend plus ces commandes (invoice_attempts >= max_attempts) : pas de nouvel envoi au redémarrage
+                if order.invoice_attempts >= self.max_attempts:
+                    notifier.notify(order.user, "order_validated", "Order Confirmation", f"Your order has been validated. Order ID: {order.id}")
+            return
+
+        for order, key in zip(orders, keys):
+            order.invoice_status = "ready"
+            order.invoice_path = key
+            await order.save(update_fields=["invoice_status", "invoice_path"])
+            # Le PDF existe : l'acheteur peut être prévenu, avec le lien de téléchargement
+            notifier.notify(order.user, "order_validated", "Order Confirmation", f"Your order has been validated. Invoice: {invoice_url(order.id)}")
+        self.stats["rendered"] += len(orders)
+
+    @property
+    def info(self):
+        return {**self.stats, "pending": len(self.pending)}
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.executor is not None:
+            await asyncio.to_thread(self.executor.shutdown, True)
+            self.executor = None
+
+
+invoices = InvoiceRenderer()
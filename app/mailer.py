@@ -0,0 +1,144 @@
+# app/mailer.py
+import asyncio
+import smtplib
+from email.mime.text import MIMEText
+from app.config import (
+    SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_STARTTLS, SMTP_TIMEOUT,
+    MAIL_FROM, MAIL_QUEUE_SIZE, MAIL_WORKERS, MAIL_MAX_RETRIES, MAIL_RETRY_BACKOFF,
+    MAIL_FLUSH_TIMEOUT,
+)
+
+
+class SMTPSession:
+    """ Connexion SMTP authentifiée, ouverte une seule fois puis réutilisée """
+
+    def __init__(self, host, port, user, password, starttls, timeout):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.server = None
+
+    def connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        self.server = server
+
+    def send(self, msg):
+        if self.server is None:
+            self.connect()
+        try:
+            self.server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Le serveur a fermé la connexion inactive : on se reconnecte une fois
+            self.connect()
+            self.server.send_message(msg)
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            pass
+        self.server = None
+
+
+class MailDispatcher:
+    """ File d'envoi d'emails : les routes déposent les messages, des workers les envoient """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, timeout=SMTP_TIMEOUT, sender=MAIL_FROM,
+                 queue_size=MAIL_QUEUE_SIZE, workers=MAIL_WORKERS,
+                 max_retries=MAIL_MAX_RETRIES, retry_backoff=MAIL_RETRY_BACKOFF):
+        self.session_args = (host, port, user, password, starttls, timeout)
+        self.sender = sender
+        self.queue_size = queue_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue = None
+        self.tasks = []
+        self.sessions = []
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0}
+
+    @property
+    def running(self):
+        return bool(self.tasks)
+
+    def start(self):
+        """ Démarre les workers (à appeler depuis la boucle asyncio, ex. au startup) """
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.sessions = [SMTPSession(*self.session_args) for _ in range(self.workers)]
+        self.tasks = [asyncio.create_task(self._worker(session)) for session in self.sessions]
+
+    def enqueue(self, to_email: str, subject: str, message: str) -> bool:
+        """ Dépose un email dans la file sans attendre l'envoi """
+        if not self.running:
+            self.start()
+
+        msg = MIMEText(message)
+        msg['Subject'] = subject
+        msg['From'] = self.sender
+        msg['To'] = to_email
+
+        try:
+            self.queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            print(f"Mail queue full, email to {to_email} dropped")
+            return False
+
+        self.stats["queued"] += 1
+        return True
+
+    async def _worker(self, session):
+        while True:
+            msg = await self.queue.get()
+            try:
+                await self._deliver(session, msg)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, session, msg):
+        for attempt in range(self.max_retries + 1):
+            try:
+                # smtplib est bloquant : l'envoi se fait dans un thread
+                await asyncio.to_thread(session.send, msg)
+                self.stats["sent"] += 1
+                return
+            except Exception as e:
+                await asyncio.to_thread(session.close)
+                if attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    print(f"Failed to send email to {msg['To']}: {e}")
+                    return
+                self.stats["retried"] += 1
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+    async def stop(self, timeout: float = MAIL_FLUSH_TIMEOUT):
+        """ Vide la file (dans la limite de timeout) puis ferme les connexions SMTP """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Mail queue not flushed before shutdown, {self.queue.qsize()} email(s) lost")
+
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        for session in self.sessions:
+            await asyncio.to_thread(session.close)
+        self.tasks = []
+        self.sessions = []
+
+
+mailer = MailDispatcher()
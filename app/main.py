@@ -1,22 +1,45 @@
 from fastapi import FastAPI
 from app.database import init_db, close_db
-from app.routes import orders, posts, products, training_materials, users, protected, notifications#, disease_detection
+from app.mailer import mailer
+from app.notifier import notifier
+from app.invoices import invoices
+from app.idempotency import idempotency
+from app.search import search
+from app.ml.history import history
+from app.routes import orders, posts, products, training_materials, users, protected, notifications, disease_detection, likes
 
 app = FastAPI()
 
 @app.on_event("startup")
 async def startup():
     await init_db()
+    await search.start()
+    mailer.start()
+    notifier.start()
+    invoices.start()
+    await invoices.resume()
+    await idempotency.purge()  # réponses Idempotency-Key expirées
+    history.start()
+    # Le modèle de détection se charge en arrière-plan ; /models/ready indique quand il est prêt
+    disease_detection.start_model_loading()
 
 @app.on_event("shutdown")
 async def shutdown():
+    # Envoyer les digests et les emails encore en file avant de fermer
+    await invoices.stop()
+    await notifier.stop()
+    await mailer.stop()
+    await disease_detection.close_model()
+    # Écrire l'historique des prédictions encore en mémoire
+    await history.stop()
     await close_db()
 
 app.include_router(users.router)
 app.include_router(notifications.router)
 app.include_router(protected.router)
 app.include_router(posts.router)
+app.include_router(likes.router)
 app.include_router(orders.router)
 app.include_router(products.router)
 app.include_router(training_materials.router)
-#app.include_router(disease_detection.router)
\ No newline at end of file
+app.include_router(disease_detection.router)
\ No newline at end of file
@@ -0,0 +1,107 @@
+# app/migrations.py
+import re
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+# generate_schemas (mode "safe") crée les tables manquantes mais ne modifie jamais une table existante :
+# les changements apportés aux tables déjà en base sont appliqués ici, au démarrage, avant generate_schemas.
+# Les index déclarés dans Meta.indexes sont ensuite créés par generate_schemas (CREATE INDEX IF NOT EXISTS),
+# une fois leurs colonnes présentes.
+
+# Colonnes ajoutées aux tables existantes : table -> [(colonne, définition SQL)]
+ADDED_COLUMNS = {
+    "users": [
+        ("city", "VARCHAR(50)"),
+    ],
+    "orders": [
+        ("invoice_status", "VARCHAR(20)"),
+        ("invoice_path", "VARCHAR(255)"),
+        ("invoice_attempts", "INT NOT NULL DEFAULT 0"),
+        ("checkout_id", "VARCHAR(32)"),
+        ("stock_reserved", "BOOL NOT NULL DEFAULT FALSE"),
+    ],
+}
+
+
+async def table_columns(conn, table: str) -> set:
+    """ Colonnes de la table (ensemble vide si elle n'existe pas) """
+    if conn.capabilities.dialect == "postgres":
+        rows = await conn.execute_query_dict(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = $1",
+            [table],
+        )
+        return {row["column_name"] for row in rows}
+    rows = await conn.execute_query_dict(f'PRAGMA table_info("{table}")')
+    return {row["name"] for row in rows}
+
+
+async def table_indexes(conn, table: str) -> list:
+    """ Index de la table : [(unique, (colonnes...))] """
+    if conn.capabilities.dialect == "postgres":
+        rows = await conn.execute_query_dict(
+            "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = $1", [table]
+        )
+        indexes = []
+        for row in rows:
+            # CREATE [UNIQUE] INDEX nom ON public."like" USING btree (user_id, material_id)
+            columns = re.search(r"\(([^()]*)\)\s*$", row["indexdef"])
+            if columns:
+                names = tuple(c.strip().strip('"') for c in columns.group(1).split(","))
+                indexes.append((row["indexdef"].startswith("CREATE UNIQUE"), names))
+        return indexes
+    indexes = []
+    for index in await conn.execute_query_dict(f'PRAGMA index_list("{table}")'):
+        info = await conn.execute_query_dict(f'PRAGMA index_info("{index["name"]}")')
+        indexes.append((bool(index["unique"]), tuple(row["name"] for row in sorted(info, key=lambda r: r["seqno"]))))
+    return indexes
+
+
+async def unique_likes(conn):
+    """
+    Index unique (user_id, material_id) sur une table "like" créée avant l'upsert
+    de app/routes/likes.py (ON CONFLICT en a besoin). Les doublons sont d'abord
+    fusionnés : la ligne la plus récente (plus grand id) est gardée, et
+    likes_count est recompté pour les posts concernés.
+    """
+    columns = ("user_id", "material_id")
+    if (True, columns) in await table_indexes(conn, "like"):
+        return
+
+    async with in_transaction() as tx:
+        if tx.capabilities.dialect == "postgres":
+            # Pas de nouveau doublon (ancienne version encore en service) entre la fusion et l'index
+            await tx.execute_script('LOCK TABLE "like" IN SHARE ROW EXCLUSIVE MODE')
+        rows = await tx.execute_query_dict(
+            'SELECT DISTINCT material_id FROM "like" GROUP BY user_id, material_id HAVING COUNT(*) > 1'
+        )
+        posts = [int(row["material_id"]) for row in rows]
+        if posts:
+            await tx.execute_script(
+                'DELETE FROM "like" WHERE id NOT IN (SELECT MAX(id) FROM "like" GROUP BY user_id, material_id)'
+            )
+            await tx.execute_script(
+                'UPDATE posts SET likes_count = (SELECT COUNT(*) FROM "like" l WHERE l.material_id = posts.id AND l.is_liked) '
+                f"WHERE id IN ({', '.join(map(str, posts))})"
+            )
+            print(f"Merged duplicate likes on {len(posts)} posts")
+        await tx.execute_script('CREATE UNIQUE INDEX IF NOT EXISTS "uid_like_user_id_material_id" ON "like" (user_id, material_id)')
+    print('Unique index on "like" (user_id, material_id) created')
+
+
+async def add_columns(conn, table: str, columns: list):
+    existing = await table_columns(conn, table)
+    if not existing:
+        return  # table absente : créée complète par generate_schemas
+    for column, definition in columns:
+        if column not in existing:
+            await conn.execute_script(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {definition}')
+            print(f"Added column {table}.{column}")
+
+
+async def upgrade_schema():
+    """ Met à niveau les tables existantes ; à appeler avant generate_schemas """
+    conn = Tortoise.get_connection("default")
+    for table, columns in ADDED_COLUMNS.items():
+        await add_columns(conn, table, columns)
+    if await table_columns(conn, "like"):
+        await unique_likes(conn)
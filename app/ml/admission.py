@@ -0,0 +1,84 @@
+# app/ml/admission.py
+import math
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from app.config import INFERENCE_MAX_PENDING, INFERENCE_MAX_PER_CLIENT
+
+
+class Overloaded(Exception):
+    """ Requête refusée par le contrôle d'admission """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Borne le nombre de prédictions en cours (globalement et par client).
+
+    Au-delà, la requête est refusée tout de suite plutôt que d'allonger la
+    file ; l'attente estimée permet au client de savoir quand réessayer.
+    """
+
+    def __init__(self, max_pending: int = INFERENCE_MAX_PENDING, max_per_client: int = INFERENCE_MAX_PER_CLIENT,
+                 smoothing: float = 0.2):
+        self.max_pending = max_pending
+        self.max_per_client = max_per_client
+        self.smoothing = smoothing
+        self.pending = 0
+        self.clients = Counter()
+        self.latency = None  # moyenne glissante (EWMA) de la durée d'une prédiction, en secondes
+        self.capacity = 1  # prédictions traitées en parallèle, mis à jour par la route
+        self.stats = {"admitted": 0, "rejected_full": 0, "rejected_client": 0}
+
+    def estimated_wait(self) -> float:
+        """ Attente estimée pour une nouvelle requête, en secondes """
+        if self.latency is None:
+            return 0.0
+        return self.latency * math.ceil((self.pending + 1) / max(1, self.capacity))
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait()))
+
+    @property
+    def info(self):
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "max_per_client": self.max_per_client,
+            "capacity": self.capacity,
+            "average_latency_seconds": self.latency,
+            "estimated_wait_seconds": self.estimated_wait(),
+            **self.stats,
+        }
+
+    @asynccontextmanager
+    async def admit(self, client: str):
+        """ Entre dans la file ou lève Overloaded si elle est pleine """
+        if self.pending >= self.max_pending:
+            self.stats["rejected_full"] += 1
+            raise Overloaded("Prediction queue is full", self.retry_after())
+        if self.clients[client] >= self.max_per_client:
+            self.stats["rejected_client"] += 1
+            raise Overloaded("Too many concurrent predictions for this client", self.retry_after())
+
+        self.pending += 1
+        self.clients[client] += 1
+        self.stats["admitted"] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.pending -= 1
+            self.clients[client] -= 1
+            if not self.clients[client]:
+                del self.clients[client]
+
+            elapsed = time.perf_counter() - start
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency += self.smoothing * (elapsed - self.latency)
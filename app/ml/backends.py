@@ -0,0 +1,235 @@
+# app/ml/backends.py
+import bisect
+import numpy as np
+from app.config import INFERENCE_BACKEND, INFERENCE_BATCH_BUCKETS
+
+BACKENDS = ("tflite_runtime", "tensorflow", "numpy")
+
+
+def import_backend(name: str):
+    """ Retourne la classe Interpreter du backend demandé """
+    if name == "tflite_runtime":
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    if name == "tensorflow":
+        import tensorflow as tf
+        return tf.lite.Interpreter
+    if name == "numpy":
+        return NumpyInterpreter
+    raise ValueError(f"Unknown inference backend: {name}")
+
+
+def resolve_backend(name: str = INFERENCE_BACKEND):
+    """ (nom, classe Interpreter) ; auto = tflite_runtime si installé, sinon tensorflow """
+    if name != "auto":
+        return name, import_backend(name)
+
+    for candidate in ("tflite_runtime", "tensorflow"):
+        try:
+            return candidate, import_backend(candidate)
+        except ImportError:
+            continue
+    raise ImportError("No TFLite runtime installed: pip install tflite-runtime (or tensorflow)")
+
+
+def interpreter_options(name: str, xnnpack: bool = True):
+    """ Arguments du constructeur Interpreter ; sans XNNPACK, seuls les noyaux TFLite de base sont utilisés """
+    if xnnpack or name == "numpy":
+        return {}
+    if name == "tflite_runtime":
+        from tflite_runtime.interpreter import OpResolverType
+    else:
+        import tensorflow as tf
+        OpResolverType = tf.lite.experimental.OpResolverType
+    return {"experimental_op_resolver_type": OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES}
+
+
+## Quantification des entrées / sorties
+
+def _quantization(detail):
+    scale, zero_point = detail.get('quantization', (0.0, 0))
+    return float(scale), int(zero_point)
+
+
+def is_quantized(detail) -> bool:
+    scale, _ = _quantization(detail)
+    return np.issubdtype(detail['dtype'], np.integer) and scale != 0
+
+
+def quantize_input(array: np.ndarray, detail) -> np.ndarray:
+    """ Convertit un tenseur float vers le type d'entrée du modèle (int8/uint8 quantifié, float16...) """
+    dtype = detail['dtype']
+    if array.dtype == dtype:
+        return array
+    if is_quantized(detail):
+        scale, zero_point = _quantization(detail)
+        info = np.iinfo(dtype)
+        quantized = np.round(array / scale + zero_point)
+        return np.clip(quantized, info.min, info.max).astype(dtype)
+    return array.astype(dtype)
+
+
+def dequantize_output(array: np.ndarray, detail) -> np.ndarray:
+    """ Ramène une sortie quantifiée (ou float16) en float32 """
+    if is_quantized(detail):
+        scale, zero_point = _quantization(detail)
+        return (array.astype(np.float32) - zero_point) * scale
+    if array.dtype != np.float32:
+        return array.astype(np.float32)
+    return array
+
+
+def batch_buckets(max_batch_size: int, max_buckets: int = INFERENCE_BATCH_BUCKETS) -> list:
+    """
+    Tailles de batch allouées : 1, 2, 4... puis max_batch_size, limitées à
+    max_buckets interpréteurs (les plus petites tailles et max_batch_size).
+    """
+    sizes, size = [], 1
+    while size < max_batch_size:
+        sizes.append(size)
+        size *= 2
+    return sizes[:max(0, max_buckets - 1)] + [max(1, max_batch_size)]
+
+
+class BatchedInterpreter:
+    """
+    Un interpréteur par taille de batch (voir batch_buckets), chacun avec ses
+    tenseurs alloués une seule fois au chargement. Un batch de n images part
+    sur le plus petit interpréteur qui peut le contenir, les lignes restantes
+    servent de remplissage : pas de resize_tensor_input ni d'allocate_tensors
+    pendant les prédictions.
+
+    Chaque interpréteur a sa propre zone de tenseurs, proportionnelle à sa
+    taille de batch : la mémoire d'un BatchedInterpreter est celle d'un seul
+    interpréteur alloué pour sum(sizes) images. max_buckets échange cette
+    mémoire contre du calcul de remplissage (1 : un seul interpréteur à
+    max_batch_size, toute image seule est complétée jusqu'au batch maximal).
+    """
+
+    def __init__(self, create, max_batch_size: int, max_buckets: int = INFERENCE_BATCH_BUCKETS):
+        self.interpreters = {}
+        for size in batch_buckets(max_batch_size, max_buckets):
+            interpreter = create()
+            detail = interpreter.get_input_details()[0]
+            if detail['shape'][0] != size:
+                interpreter.resize_tensor_input(detail['index'], [size, *detail['shape'][1:]])
+            interpreter.allocate_tensors()
+            self.interpreters[size] = interpreter
+        self.sizes = sorted(self.interpreters)
+
+    def for_batch(self, count: int):
+        """ Interpréteur alloué pour au moins count images """
+        i = bisect.bisect_left(self.sizes, count)
+        if i == len(self.sizes):
+            raise ValueError(f"Batch of {count} images exceeds the allocated maximum ({self.sizes[-1]})")
+        return self.interpreters[self.sizes[i]]
+
+    # Détails des tenseurs (pool, ModelHandle, processus d'inférence) : ceux du plus petit batch alloué
+    def get_input_details(self):
+        return self.interpreters[self.sizes[0]].get_input_details()
+
+    def get_output_details(self):
+        return self.interpreters[self.sizes[0]].get_output_details()
+
+
+## Implémentation NumPy de référence (tests, environnements sans TFLite)
+
+class NumpyInterpreter:
+    """
+    Interpréteur minimal compatible avec l'API tf.lite.Interpreter.
+
+    Le « modèle » est un fichier .npz (voir create_reference_model) : moyenne
+    globale des pixels, couche dense puis softmax. Il sert à tester la chaîne
+    d'inférence (batching, pool, quantification) sans TensorFlow.
+    """
+
+    def __init__(self, model_path=None, num_threads=None, **kwargs):
+        with np.load(model_path) as data:
+            self.weights = data["weights"].astype(np.float32)
+            self.bias = data["bias"].astype(np.float32)
+            self.shape = data["input_shape"].astype(np.int32)
+            self.input_dtype = np.dtype(str(data["input_dtype"])).type
+            self.input_quantization = (float(data["input_scale"]), int(data["input_zero_point"]))
+            self.output_dtype = np.dtype(str(data["output_dtype"])).type
+            self.output_quantization = (float(data["output_scale"]), int(data["output_zero_point"]))
+        self.input = None
+        self.output = None
+
+    def allocate_tensors(self):
+        self.input = np.zeros(self.shape, dtype=self.input_dtype)
+        self.output = np.zeros((self.shape[0], self.weights.shape[1]), dtype=self.output_dtype)
+
+    def _detail(self, name, index, shape, dtype, quantization):
+        scale, zero_point = quantization
+        return {
+            "name": name,
+            "index": index,
+            "shape": np.array(shape, dtype=np.int32),
+            "shape_signature": np.array([-1, *shape[1:]], dtype=np.int32),
+            "dtype": dtype,
+            "quantization": quantization,
+            "quantization_parameters": {
+                "scales": np.array([scale] if scale else [], dtype=np.float32),
+                "zero_points": np.array([zero_point] if scale else [], dtype=np.int32),
+                "quantized_dimension": 0,
+            },
+        }
+
+    def get_input_details(self):
+        return [self._detail("input", 0, self.shape, self.input_dtype, self.input_quantization)]
+
+    def get_output_details(self):
+        shape = (self.shape[0], self.weights.shape[1])
+        return [self._detail("output", 1, shape, self.output_dtype, self.output_quantization)]
+
+    def resize_tensor_input(self, index, shape, strict=False):
+        self.shape = np.array(shape, dtype=np.int32)
+
+    def set_tensor(self, index, value):
+        self.input[...] = value
+
+    def tensor(self, index):
+        return lambda: self.input if index == 0 else self.output
+
+    def get_tensor(self, index):
+        return (self.input if index == 0 else self.output).copy()
+
+    def invoke(self):
+        x = self.input.astype(np.float32)
+        scale, zero_point = self.input_quantization
+        if scale:
+            x = (x - zero_point) * scale
+
+        logits = x.mean(axis=(1, 2)) @ self.weights + self.bias
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs = exp / exp.sum(axis=1, keepdims=True)
+
+        scale, zero_point = self.output_quantization
+        if scale:
+            info = np.iinfo(self.output_dtype)
+            probs = np.clip(np.round(probs / scale + zero_point), info.min, info.max)
+        self.output = probs.astype(self.output_dtype)
+
+
+def create_reference_model(path, input_shape=(1, 224, 224, 3), classes: int = 3,
+                           precision: str = "float32", seed: int = 0):
+    """ Écrit un modèle NumPy de référence ; precision = float32, float16 ou int8 """
+    rng = np.random.default_rng(seed)
+    params = {
+        "weights": rng.normal(0, 4, size=(input_shape[-1], classes)).astype(np.float32),
+        "bias": rng.normal(0, 0.1, size=classes).astype(np.float32),
+        "input_shape": np.array(input_shape, dtype=np.int32),
+        "input_dtype": "float32", "input_scale": 0.0, "input_zero_point": 0,
+        "output_dtype": "float32", "output_scale": 0.0, "output_zero_point": 0,
+    }
+    if precision == "float16":
+        params["weights"] = params["weights"].astype(np.float16)
+        params["bias"] = params["bias"].astype(np.float16)
+    elif precision == "int8":
+        # Entrée dans [0, 1] et sortie (probabilités) quantifiées sur int8
+        params.update(input_dtype="int8", input_scale=1 / 255, input_zero_point=-128,
+                      output_dtype="int8", output_scale=1 / 256, output_zero_point=-128)
+    elif precision != "float32":
+        raise ValueError(f"Unknown precision: {precision}")
+    np.savez(path, **params)
+    return path
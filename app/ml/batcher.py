@@ -0,0 +1,124 @@
+# app/ml/batcher.py
+import asyncio
+import inspect
+import time
+from collections import Counter
+import numpy as np
+from app.config import INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS
+
+
+class InferenceBatcher:
+    """
+    Regroupe les requêtes de prédiction concurrentes en un seul appel au modèle.
+
+    La première entrée reçue ouvre une fenêtre de max_wait_ms ; le batch part dès
+    que la fenêtre expire ou que max_batch_size entrées sont arrivées. Chaque
+    appelant récupère sa propre tranche du résultat.
+    """
+
+    def __init__(self, run_batch, max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms: float = INFERENCE_MAX_WAIT_MS, max_concurrent_batches: int = 1):
+        self.run_batch = run_batch  # fonction (ou coroutine) : [entrée] * N -> sorties (N, ...)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self.slots = None
+        self.running = set()
+        self.pending = []
+        self.arrived = None
+        self.task = None
+        self.batch_sizes = Counter()
+        self.items = 0
+
+    @property
+    def stats(self):
+        batches = sum(self.batch_sizes.values())
+        return {
+            "batches": batches,
+            "items": self.items,
+            "mean_batch_size": self.items / batches if batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "pending": len(self.pending),
+        }
+
+    def start(self):
+        if self.task is None:
+            self.pending = []
+            self.arrived = asyncio.Event()
+            self.slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        # Laisser finir les batches déjà partis
+        await asyncio.gather(*self.running, return_exceptions=True)
+        for _, future in self.pending:
+            future.cancel()
+        self.pending = []
+
+    async def submit(self, item) -> np.ndarray:
+        """ Ajoute une entrée au prochain batch et attend sa sortie (1, ...) """
+        if self.task is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((item, future))
+        self.arrived.set()
+        return await future
+
+    async def _collect(self):
+        await self.arrived.wait()
+        deadline = time.monotonic() + self.max_wait
+        while len(self.pending) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+
+        items = self.pending[:self.max_batch_size]
+        del self.pending[:self.max_batch_size]
+        if self.pending:
+            self.arrived.set()
+        else:
+            self.arrived.clear()
+        return items
+
+    async def _run(self):
+        while True:
+            # Attendre un interpréteur libre avant d'ouvrir le batch suivant
+            await self.slots.acquire()
+            items = await self._collect()
+            # Ignorer les requêtes déjà abandonnées par le client
+            items = [(item, future) for item, future in items if not future.done()]
+            if not items:
+                self.slots.release()
+                continue
+
+            self.batch_sizes[len(items)] += 1
+            self.items += len(items)
+            task = asyncio.create_task(self._execute(items))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def _execute(self, items):
+        try:
+            outputs = self.run_batch([item for item, _ in items])
+            if inspect.isawaitable(outputs):
+                outputs = await outputs
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.slots.release()
+
+        for i, (_, future) in enumerate(items):
+            if not future.done():
+                future.set_result(outputs[i:i + 1])
@@ -0,0 +1,166 @@
+# app/ml/cache.py
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app.config import (
+    PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_MAX_BYTES, PREDICTION_CACHE_TTL, PREDICTION_CACHE_DB,
+)
+
+# Coût approximatif d'une entrée en plus du tableau de prédictions (clé, tuple, OrderedDict)
+ENTRY_OVERHEAD = 256
+
+
+def model_fingerprint(model_path: str) -> str:
+    """ Identifie une version du fichier modèle (chemin, taille, date de modification) """
+    stat = os.stat(model_path)
+    return hashlib.sha1(f"{os.path.abspath(model_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+
+class PredictionCache:
+    """
+    Cache LRU avec TTL des prédictions, indexé par le hash du fichier envoyé.
+
+    La mémoire est bornée en nombre d'entrées et en octets. Un second niveau
+    optionnel (SQLite) survit aux redémarrages. Tout le cache est invalidé
+    quand l'empreinte du modèle change.
+    """
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_MAX_ENTRIES, max_bytes: int = PREDICTION_CACHE_MAX_BYTES,
+                 ttl: float = PREDICTION_CACHE_TTL, db_path: str = PREDICTION_CACHE_DB):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, predictions, predicted_class, size)
+        self.bytes = 0
+        self.model = None
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self.lock = threading.Lock()
+        self.db = None
+        self.purges = set()  # purges du disque en cours (set_model)
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "predictions TEXT NOT NULL, predicted_class TEXT NOT NULL)"
+            )
+            self.db.commit()
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @property
+    def info(self):
+        return {**self.stats, "entries": len(self.entries), "bytes": self.bytes, "model": self.model}
+
+    def set_model(self, fingerprint: str):
+        """ Vide le cache si le modèle a changé depuis le dernier appel """
+        if fingerprint == self.model:
+            return
+        self.model = fingerprint
+        self.clear()
+        if self.db is not None:
+            # Purge du disque dans un thread, comme les autres accès SQLite : une grosse table ne bloque pas
+            # la boucle. Les lignes de l'ancien modèle ne sont plus lues entre-temps (_disk_get filtre sur model)
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._disk_purge(fingerprint)  # hors boucle asyncio (scripts)
+                return
+            purge = loop.create_task(asyncio.to_thread(self._disk_purge, fingerprint))
+            self.purges.add(purge)
+            purge.add_done_callback(self._purged)
+
+    def _purged(self, purge):
+        self.purges.discard(purge)
+        if not purge.cancelled() and purge.exception() is not None:
+            print(f"Failed to purge the prediction cache: {purge.exception()}")
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def get(self, key: str):
+        """ Lecture en mémoire uniquement : (predictions, predicted_class) ou None """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, predictions, predicted_class, size = entry
+        if expires_at < time.time():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return predictions, predicted_class
+
+    def put(self, key: str, predictions: np.ndarray, predicted_class: str, expires_at: float = None):
+        if key in self.entries:
+            self._remove(key)
+        size = predictions.nbytes + len(key) + ENTRY_OVERHEAD
+        self.entries[key] = (expires_at or time.time() + self.ttl, predictions, predicted_class, size)
+        self.bytes += size
+
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.bytes -= entry[3]
+
+    async def lookup(self, key: str):
+        """ Cherche en mémoire puis sur disque ; compte les hits/misses """
+        cached = self.get(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached
+
+        if self.db is not None:
+            row = await asyncio.to_thread(self._disk_get, key, self.model)
+            if row is not None:
+                expires_at, predictions, predicted_class = row
+                self.put(key, predictions, predicted_class, expires_at)
+                self.stats["disk_hits"] += 1
+                return predictions, predicted_class
+
+        self.stats["misses"] += 1
+        return None
+
+    async def store(self, key: str, predictions: np.ndarray, predicted_class: str, model: str = None):
+        # Résultat calculé par un modèle qui n'est plus actif : ne pas le mettre en cache
+        if model is not None and model != self.model:
+            return
+        self.put(key, predictions, predicted_class)
+        if self.db is not None:
+            await asyncio.to_thread(self._disk_put, key, self.model, predictions, predicted_class)
+
+    def _disk_get(self, key, model):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT expires_at, predictions, predicted_class FROM predictions WHERE key = ? AND model = ?",
+                (key, model),
+            ).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], np.array(json.loads(row[1]), dtype=np.float32), row[2]
+
+    def _disk_purge(self, model):
+        with self.lock:
+            self.db.execute("DELETE FROM predictions WHERE model != ?", (model,))
+            self.db.commit()
+
+    def _disk_put(self, key, model, predictions, predicted_class):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                (key, model, time.time() + self.ttl, json.dumps(predictions.tolist()), predicted_class),
+            )
+            self.db.commit()
@@ -0,0 +1,121 @@
+# app/ml/history.py
+import asyncio
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+from app.config import PREDICTION_HISTORY_FLUSH_INTERVAL, PREDICTION_HISTORY_BATCH_SIZE, PREDICTION_HISTORY_MAX_BUFFER
+from app.models import PredictionRecord, PredictionRollup
+
+
+class PredictionHistory:
+    """
+    Historique des prédictions écrit en arrière-plan (write-behind).
+
+    record() ne touche pas la base : les lignes sont gardées en mémoire puis
+    écrites par lots avec bulk_create, et les compteurs PredictionRollup
+    (jour, classe, ville) sont incrémentés dans la même transaction.
+    """
+
+    def __init__(self, interval: float = PREDICTION_HISTORY_FLUSH_INTERVAL,
+                 batch_size: int = PREDICTION_HISTORY_BATCH_SIZE, max_buffer: int = PREDICTION_HISTORY_MAX_BUFFER):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        # Base indisponible depuis longtemps : le buffer plein perd les plus anciennes plutôt que la mémoire
+        self.buffer = deque(maxlen=max_buffer)
+        self.task = None
+        self.wakeup = asyncio.Event()
+        self.lock = asyncio.Lock()
+        self.stats = {"recorded": 0, "written": 0, "dropped": 0, "flushes": 0, "failures": 0}
+
+    def start(self):
+        if self.task is None and self.interval > 0:
+            self.task = asyncio.create_task(self._run())
+
+    def record(self, user, image_hash: str, predicted_class: str, confidence: float, model_version: str = None):
+        """ Ajoute une prédiction au buffer ; un lot plein réveille l'écriture sans attendre l'intervalle """
+        if len(self.buffer) >= self.max_buffer:
+            self.stats["dropped"] += 1  # la plus ancienne sort du deque à l'append
+        self.buffer.append(PredictionRecord(
+            user_id=user.id if user is not None else None,
+            city=getattr(user, "city", None) or None,
+            image_hash=image_hash,
+            predicted_class=predicted_class,
+            confidence=confidence,
+            model_version=model_version,
+            created_at=datetime.now(timezone.utc),
+        ))
+        self.stats["recorded"] += 1
+        if len(self.buffer) >= self.batch_size:
+            self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Failed to write prediction history: {e}")
+
+    async def flush(self):
+        """ Écrit tout le buffer, par lots de batch_size """
+        async with self.lock:
+            while self.buffer:
+                rows = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+                try:
+                    await self._write(rows)
+                except Exception:
+                    # Remises en tête du buffer pour le prochain essai, sans dépasser max_buffer
+                    overflow = len(self.buffer) + len(rows) - self.max_buffer
+                    if overflow > 0:
+                        rows = rows[overflow:]
+                        self.stats["dropped"] += overflow
+                    self.buffer.extendleft(reversed(rows))
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["written"] += len(rows)
+                self.stats["flushes"] += 1
+
+    async def _write(self, rows):
+        rollups = defaultdict(lambda: [0, 0.0])
+        for row in rows:
+            key = (row.created_at.date(), row.predicted_class, row.city or "")
+            rollups[key][0] += 1
+            rollups[key][1] += row.confidence
+
+        async with in_transaction() as conn:
+            await PredictionRecord.bulk_create(rows, using_db=conn)
+            for (day, predicted_class, city), (count, confidence_sum) in rollups.items():
+                await self._increment(conn, day, predicted_class, city, count, confidence_sum)
+
+    async def _increment(self, conn, day, predicted_class, city, count, confidence_sum):
+        """ Incrément atomique ; la ligne est créée au premier passage """
+        updated = await PredictionRollup.filter(day=day, predicted_class=predicted_class, city=city).using_db(conn).update(
+            count=F("count") + count, confidence_sum=F("confidence_sum") + confidence_sum)
+        if not updated:
+            # Si un autre processus la crée en même temps, la contrainte unique annule la transaction :
+            # le lot reste dans le buffer et l'incrément passe au flush suivant
+            await PredictionRollup.create(day=day, predicted_class=predicted_class, city=city, count=count,
+                                          confidence_sum=confidence_sum, using_db=conn)
+
+    @property
+    def info(self):
+        return {**self.stats, "buffered": len(self.buffer)}
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Failed to write prediction history: {e}")
+
+
+history = PredictionHistory()
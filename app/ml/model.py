@@ -0,0 +1,91 @@
+# app/ml/model.py
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+import numpy as np
+from app.ml.backends import batch_buckets
+from app.ml.batcher import InferenceBatcher
+from app.ml.cache import model_fingerprint
+from app.ml.pool import InterpreterPool
+
+
+class ModelHandle:
+    """ Un modèle chargé en mémoire : pool d'interpréteurs, batcher et métadonnées """
+
+    def __init__(self, path: str, factory, predict, version: str = None):
+        self.path = path
+        self.version = version or os.path.basename(path)
+        self.fingerprint = model_fingerprint(path)
+
+        start = time.perf_counter()
+        self.pool = InterpreterPool(factory)
+        self.load_seconds = time.perf_counter() - start
+        if model_fingerprint(path) != self.fingerprint:
+            # Fichier réécrit pendant le chargement : l'empreinte ne décrirait pas le modèle chargé
+            self.pool.close()
+            raise ValueError(f"Model file {path} changed while loading")
+        self.warmup_seconds = None
+        self.in_flight = 0  # requêtes en cours qui utilisent ce modèle
+
+        self.input_details = self.pool.input_details
+        self.output_details = self.pool.output_details
+        shape = self.input_details[0]['shape']
+        self.input_size = (int(shape[2]), int(shape[1]))  # (largeur, hauteur) pour PIL
+
+        self.predict = predict  # fonction (interpreter, [images uint8]) -> sorties
+        # Regroupe les prédictions concurrentes ; chaque batch part sur un interpréteur libre du pool
+        self.batcher = InferenceBatcher(
+            lambda images: self.pool.run(predict, images),
+            max_concurrent_batches=self.pool.size,
+        )
+
+    def warmup(self):
+        """ Première inférence sur des images synthétiques, pour chaque interpréteur et chaque taille de batch """
+        shape = self.input_details[0]['shape']
+        dummy = np.zeros((int(shape[1]), int(shape[2]), int(shape[3])), dtype=np.uint8)
+        sizes = batch_buckets(self.batcher.max_batch_size)
+        start = time.perf_counter()
+        outputs = []
+        self.pool.warmup(lambda interpreter: outputs.extend(
+            (size, self.predict(interpreter, [dummy] * size)) for size in sizes))
+        self.warmup_seconds = time.perf_counter() - start
+
+        # Contrôle de santé : une sortie par image, sans NaN ni infini
+        for size, output in outputs:
+            if output.shape[0] != size or not np.all(np.isfinite(output)):
+                raise ValueError(f"Model {self.version} returned an invalid warmup output {output.shape}")
+
+    @asynccontextmanager
+    async def use(self):
+        """ Marque une requête en cours : le modèle n'est pas fermé avant la fin du bloc """
+        self.in_flight += 1
+        try:
+            yield self
+        finally:
+            self.in_flight -= 1
+
+    async def submit(self, pixels):
+        return await self.batcher.submit(pixels)
+
+    @property
+    def info(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "interpreters": self.pool.size,
+            "batch_sizes": batch_buckets(self.batcher.max_batch_size),  # interpréteurs alloués par emplacement du pool
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "in_flight": self.in_flight,
+        }
+
+    async def close(self):
+        await self.batcher.stop()
+        await asyncio.to_thread(self.pool.close)
+
+    async def retire(self, poll_interval: float = 0.05):
+        """ Ferme le modèle une fois les requêtes en cours terminées """
+        while self.in_flight:
+            await asyncio.sleep(poll_interval)
+        await self.close()
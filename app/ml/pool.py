@@ -0,0 +1,62 @@
+# app/ml/pool.py
+import asyncio
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from app.config import INFERENCE_POOL_SIZE
+
+
+class InterpreterPool:
+    """
+    Pool d'interpréteurs TFLite, chacun avec ses tenseurs alloués une seule fois.
+
+    Un interpréteur n'est pas thread-safe : chaque inférence en emprunte un
+    (acquire/release) et s'exécute dans un thread dédié, hors de la boucle asyncio.
+    """
+
+    def __init__(self, factory, size: int = INFERENCE_POOL_SIZE):
+        self.size = max(1, size)
+        self.available = queue.Queue()
+        for _ in range(self.size):
+            self.available.put(factory())
+
+        first = self.available.queue[0]
+        self.input_details = first.get_input_details()
+        self.output_details = first.get_output_details()
+        self.executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="tflite")
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        interpreter = self.available.get(timeout=timeout)
+        try:
+            yield interpreter
+        finally:
+            self.available.put(interpreter)
+
+    def run_sync(self, fn, *args):
+        """ Exécute fn(interpreter, *args) avec un interpréteur du pool """
+        with self.acquire() as interpreter:
+            return fn(interpreter, *args)
+
+    async def run(self, fn, *args):
+        """ Comme run_sync, mais dans le thread pool pour ne pas bloquer la boucle """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.run_sync, fn, *args)
+
+    def warmup(self, fn, *args):
+        """ Exécute fn(interpreter, *args) une fois sur chaque interpréteur du pool """
+        interpreters = [self.available.get() for _ in range(self.size)]
+        try:
+            for interpreter in interpreters:
+                fn(interpreter, *args)
+        finally:
+            for interpreter in interpreters:
+                self.available.put(interpreter)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        # Connexions au processus d'inférence (voir app/ml/worker.py)
+        while not self.available.empty():
+            interpreter = self.available.get()
+            if hasattr(interpreter, "close"):
+                interpreter.close()
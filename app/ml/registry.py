@@ -0,0 +1,164 @@
+# app/ml/registry.py
+import asyncio
+import os
+import re
+import time
+from app.config import MODELS_DIR, MODEL_POLL_INTERVAL
+from app.ml.cache import model_fingerprint
+
+MODEL_EXTENSIONS = (".tflite", ".npz")
+
+
+def version_key(version: str):
+    """ Tri naturel des versions : cacao_v10 passe après cacao_v9 """
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", version)]
+
+
+class ModelRegistry:
+    """
+    Versions du modèle disponibles dans un dossier (un fichier par version).
+
+    Une nouvelle version est chargée et chauffée en arrière-plan, puis
+    remplace l'active d'un seul coup si elle est saine. L'ancienne version
+    n'est fermée qu'une fois ses requêtes en cours terminées.
+    """
+
+    def __init__(self, loader, models_dir: str = MODELS_DIR, poll_interval: float = MODEL_POLL_INTERVAL,
+                 on_activate=None):
+        self.loader = loader  # fonction (path, version) -> ModelHandle chauffé, appelée dans un thread
+        self.models_dir = models_dir
+        self.poll_interval = poll_interval
+        self.on_activate = on_activate  # callback(handle) après chaque bascule
+        self.versions = {}  # version -> {"path", "fingerprint", "status", "error", "activated_at"}
+        self.active = None
+        self.history = []  # versions activées, la dernière est l'active
+        self.lock = asyncio.Lock()
+        self.task = None
+        self.retiring = set()
+
+    def register(self, path: str, version: str = None):
+        """ Ajoute (ou met à jour) une version ; renvoie son nom si elle est nouvelle ou modifiée """
+        version = version or os.path.splitext(os.path.basename(path))[0]
+        fingerprint = model_fingerprint(path)
+        known = self.versions.get(version)
+        if known and known["fingerprint"] == fingerprint:
+            return None
+        self.versions[version] = {
+            "path": path,
+            "fingerprint": fingerprint,
+            "status": "available",
+            "error": None,
+            "activated_at": None,
+        }
+        return version
+
+    def scan(self):
+        """ Enregistre les fichiers du dossier ; renvoie les versions nouvelles ou modifiées """
+        changed = []
+        if os.path.isdir(self.models_dir):
+            for name in os.listdir(self.models_dir):
+                if name.endswith(MODEL_EXTENSIONS):
+                    version = self.register(os.path.join(self.models_dir, name))
+                    if version:
+                        changed.append(version)
+        # Fichiers enregistrés hors du dossier (MODEL_PATH) : remplacés sur place ?
+        models_dir = os.path.abspath(self.models_dir)
+        for version, info in list(self.versions.items()):
+            path = info["path"]
+            if os.path.dirname(os.path.abspath(path)) != models_dir and os.path.exists(path):
+                if self.register(path, version):
+                    changed.append(version)
+        return sorted(changed, key=version_key)
+
+    def latest(self):
+        candidates = [v for v, info in self.versions.items() if info["status"] != "failed"]
+        return max(candidates, key=version_key) if candidates else None
+
+    def describe(self):
+        return [
+            {"version": version, **info, "active": self.active is not None and self.active.version == version}
+            for version, info in sorted(self.versions.items(), key=lambda item: version_key(item[0]))
+        ]
+
+    async def activate(self, version: str):
+        """ Charge, chauffe puis bascule sur la version demandée """
+        async with self.lock:
+            info = self.versions.get(version)
+            if info is None:
+                raise KeyError(version)
+            if self.active is not None and self.active.version == version and self.active.fingerprint == info["fingerprint"]:
+                return self.active
+
+            info["status"] = "loading"
+            try:
+                handle = await asyncio.to_thread(self.loader, info["path"], version)
+            except Exception as e:
+                info.update(status="failed", error=str(e))
+                print(f"Model {version} failed to load: {e}")
+                raise
+
+            previous, self.active = self.active, handle
+            info.update(status="active", error=None, activated_at=time.time())
+            self.history.append(version)
+            if previous is not None:
+                if previous.version in self.versions and previous.version != version:
+                    self.versions[previous.version]["status"] = "available"
+                # Les requêtes déjà lancées finissent sur l'ancien interpréteur
+                task = asyncio.create_task(previous.retire())
+                self.retiring.add(task)
+                task.add_done_callback(self.retiring.discard)
+
+            if self.on_activate:
+                self.on_activate(handle)
+            print(f"Model {version} active")
+            return handle
+
+    async def rollback(self, version: str = None):
+        """ Revient à la version donnée, ou à la précédente version activée """
+        if version is None:
+            previous = [v for v in reversed(self.history[:-1]) if v in self.versions and v != self.history[-1]]
+            if not previous:
+                raise KeyError("no previous version")
+            version = previous[0]
+        return await self.activate(version)
+
+    async def refresh(self):
+        """ Scanne le dossier et active la plus récente des nouvelles versions, ou recharge l'active si son fichier a changé """
+        changed = await asyncio.to_thread(self.scan)
+        newest = self.latest()
+        if newest is None:
+            return
+        # Après un rollback, on ne rebascule que si une version vraiment nouvelle arrive
+        if self.active is None or (newest in changed and version_key(newest) >= version_key(self.active.version)):
+            version = newest
+        elif self.active.version in changed:
+            # Fichier de la version active remplacé sur place : recharger (et vider le cache des prédictions)
+            version = self.active.version
+        else:
+            return
+        try:
+            await self.activate(version)
+        except Exception:
+            pass
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Model registry refresh failed: {e}")
+
+    def start(self):
+        if self.task is None and self.poll_interval > 0:
+            self.task = asyncio.create_task(self.watch())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        await asyncio.gather(*self.retiring, return_exceptions=True)
+        if self.active is not None:
+            await self.active.close()
+            self.active = None
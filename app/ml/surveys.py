@@ -0,0 +1,199 @@
+# app/ml/surveys.py
+import asyncio
+import json
+import os
+import time
+import uuid
+import zipfile
+from collections import Counter, OrderedDict
+from app.config import SURVEY_MAX_IMAGES, SURVEY_MAX_RUNNING, SURVEY_JOB_TTL, SURVEY_MAX_JOBS
+from app.ml.uploads import UPLOAD_MAX_BYTES, read_image_stream, check_image_header
+
+
+def is_zip(upload) -> bool:
+    return bytes(upload.head[:4]) == b"PK\x03\x04"
+
+
+def survey_entries(uploads, max_images: int = SURVEY_MAX_IMAGES):
+    """
+    Images d'un relevé, lues à la demande : (nom, ouvrir) où ouvrir() renvoie
+    un SpooledUpload contrôlé. Les archives zip sont parcourues entrée par
+    entrée, sans être décompressées d'avance.
+    """
+    count = 0
+    for upload in uploads:
+        if not is_zip(upload):
+            if count >= max_images:
+                return
+            count += 1
+
+            def open_upload(upload=upload):
+                check_image_header(upload, complete=True)
+                return upload
+            yield upload.filename, open_upload
+            continue
+
+        upload.file.seek(0)
+        with zipfile.ZipFile(upload.file) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                base = os.path.basename(name)
+                # Dossiers et fichiers système (macOS) ignorés
+                if info.is_dir() or name.startswith("__MACOSX/") or base.startswith("."):
+                    continue
+                if count >= max_images:
+                    return
+                count += 1
+
+                def open_entry(info=info):
+                    # Taille annoncée vérifiée avant décompression, puis bornée pendant la lecture
+                    if info.file_size > UPLOAD_MAX_BYTES:
+                        raise ValueError(f"Image larger than {UPLOAD_MAX_BYTES} bytes")
+                    with archive.open(info) as stream:
+                        return read_image_stream(stream)
+                yield name, open_entry
+
+
+class SurveyJob:
+    """ Un relevé : résultats par image dans l'ordre de l'archive et résumé par classe """
+
+    def __init__(self, owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = "queued"
+        self.error = None
+        self.model_version = None
+        self.results = []
+        self.classes = Counter()
+        self.confidence = Counter()  # somme des confiances par classe
+        self.failed = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "canceled")
+
+    async def add(self, result: dict):
+        result = {"type": "result", "index": len(self.results), **result}
+        self.results.append(result)
+        if result["status"] == "success":
+            self.classes[result["predicted_class"]] += 1
+            self.confidence[result["predicted_class"]] += result["confidence"]
+        else:
+            self.failed += 1
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def finish(self, status: str, error: str = None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        async with self.changed:
+            self.changed.notify_all()
+
+    @property
+    def summary(self):
+        end = self.finished_at or time.time()
+        return {
+            "type": "summary",
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "model_version": self.model_version,
+            "images": len(self.results),
+            "succeeded": len(self.results) - self.failed,
+            "failed": self.failed,
+            "classes": dict(self.classes),
+            "average_confidence": {name: self.confidence[name] / count for name, count in self.classes.items()},
+            "seconds": end - self.started_at if self.started_at else 0.0,
+        }
+
+    async def follow(self):
+        """ Résultats déjà obtenus puis à venir, et le résumé à la fin """
+        index = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: index < len(self.results) or self.finished)
+            while index < len(self.results):
+                yield self.results[index]
+                index += 1
+            if self.finished and index >= len(self.results):
+                yield self.summary
+                return
+
+    async def ndjson(self):
+        async for line in self.follow():
+            yield json.dumps(line) + "\n"
+
+
+class SurveyManager:
+    """
+    Relevés en cours et terminés. Au plus max_running relevés sont analysés
+    en même temps pour laisser de la place aux prédictions unitaires ; les
+    résultats restent consultables ttl secondes.
+    """
+
+    def __init__(self, max_running: int = SURVEY_MAX_RUNNING, ttl: float = SURVEY_JOB_TTL,
+                 max_jobs: int = SURVEY_MAX_JOBS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.running = asyncio.Semaphore(max_running)
+        self.jobs = OrderedDict()
+        self.tasks = set()
+
+    def get(self, job_id: str):
+        self.purge()
+        return self.jobs.get(job_id)
+
+    def purge(self):
+        now = time.time()
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished:
+            if job.finished_at + self.ttl < now:
+                del self.jobs[job.id]
+        # Au-delà de max_jobs, les plus anciens relevés terminés sont oubliés
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.max_jobs)]:
+            del self.jobs[job.id]
+
+    def submit(self, job: SurveyJob, process, cleanup=None):
+        """ Lance process(job) en tâche de fond ; cleanup() est appelé à la fin dans tous les cas """
+        self.purge()
+        self.jobs[job.id] = job
+
+        async def run():
+            try:
+                async with self.running:
+                    job.status = "running"
+                    job.started_at = time.time()
+                    await process(job)
+                await job.finish("completed")
+            except asyncio.CancelledError:
+                await job.finish("canceled")
+            except Exception as e:
+                print(f"Survey {job.id} failed: {e}")
+                await job.finish("failed", str(e))
+            finally:
+                if cleanup is not None:
+                    cleanup()
+
+        task = asyncio.create_task(run())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    @property
+    def info(self):
+        return {
+            "jobs": len(self.jobs),
+            "running": sum(1 for job in self.jobs.values() if job.status == "running"),
+            "queued": sum(1 for job in self.jobs.values() if job.status == "queued"),
+        }
+
+    async def stop(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
@@ -0,0 +1,234 @@
+# app/ml/uploads.py
+import hashlib
+import io
+import tempfile
+from PIL import Image
+from app.config import UPLOAD_MAX_BYTES, UPLOAD_SPOOL_BYTES, UPLOAD_MAX_PIXELS, UPLOAD_ALLOWED_FORMATS
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Protection de Pillow contre les images qui explosent en mémoire une fois décodées
+Image.MAX_IMAGE_PIXELS = UPLOAD_MAX_PIXELS
+
+# Octets lus au maximum pour identifier le format et les dimensions
+SNIFF_MAX_BYTES = 256 * 1024
+# Marge pour les en-têtes multipart autour du fichier
+MULTIPART_OVERHEAD = 16 * 1024
+
+upload_stats = {
+    "accepted": 0,
+    "rejected": 0,
+    "spooled_to_disk": 0,
+    "max_upload_bytes": 0,
+    "peak_memory_bytes": 0,  # plus gros upload gardé en RAM (borné par UPLOAD_SPOOL_BYTES)
+}
+
+
+class UploadRejected(Exception):
+    """ Upload refusé avant la fin de la lecture (taille, format, dimensions) """
+
+    def __init__(self, status_code: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+
+
+class SpooledUpload:
+    """ Fichier reçu : en mémoire jusqu'à spool_bytes, puis sur disque ; hash calculé au fil de l'eau """
+
+    def __init__(self, spool_bytes: int = UPLOAD_SPOOL_BYTES):
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+        self.spool_bytes = spool_bytes
+        self.filename = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.head = bytearray()  # premiers octets, pour l'identification du format
+        self.format = None
+        self.dimensions = None
+
+    @property
+    def sha256(self) -> str:
+        return self.digest.hexdigest()
+
+    @property
+    def on_disk(self) -> bool:
+        return getattr(self.file, "_rolled", False)
+
+    def write(self, data: bytes):
+        self.file.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+        if len(self.head) < SNIFF_MAX_BYTES:
+            self.head += data[:SNIFF_MAX_BYTES - len(self.head)]
+
+    def open_image(self):
+        self.file.seek(0)
+        return Image.open(self.file)
+
+    def close(self):
+        self.file.close()
+
+
+def sniff_image(head: bytes):
+    """ (format, (largeur, hauteur)) lus depuis l'en-tête, ou None s'il manque des octets """
+    try:
+        with Image.open(io.BytesIO(head)) as image:
+            return image.format, image.size
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return None
+
+
+def check_image_header(upload: SpooledUpload, complete: bool = False):
+    """ Valide format et dimensions dès que l'en-tête est lisible, sans décoder l'image """
+    if upload.format is not None:
+        return
+    try:
+        sniffed = sniff_image(bytes(upload.head))
+    except Image.DecompressionBombError:
+        raise UploadRejected(413, "Image too large")
+    if sniffed is None:
+        if complete or len(upload.head) >= SNIFF_MAX_BYTES:
+            raise UploadRejected(415, "Unsupported or corrupted image")
+        return
+
+    upload.format, upload.dimensions = sniffed
+    if upload.format not in UPLOAD_ALLOWED_FORMATS:
+        raise UploadRejected(415, f"Unsupported image format {upload.format}")
+    width, height = upload.dimensions
+    if width * height > UPLOAD_MAX_PIXELS:
+        raise UploadRejected(413, f"Image too large ({width}x{height} pixels)")
+
+
+async def receive_files(request, max_bytes: int = UPLOAD_MAX_BYTES, spool_bytes: int = UPLOAD_SPOOL_BYTES,
+                        max_files: int = 1, check_head=None):
+    """
+    Lit les fichiers d'un corps multipart/form-data par morceaux.
+
+    max_bytes borne le total des fichiers reçus, au-delà de max_files les
+    fichiers suivants sont ignorés. La lecture s'arrête dès que max_bytes
+    est dépassé ou que check_head(upload) refuse l'en-tête d'un fichier ;
+    le reste du corps n'est alors jamais lu.
+    """
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes + MULTIPART_OVERHEAD * max_files:
+        raise UploadRejected(413, f"Upload larger than {max_bytes} bytes")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected(415, "Expected a multipart/form-data upload")
+
+    uploads = []
+    part = {"headers": {}, "field": bytearray(), "value": bytearray(), "current": None, "received": 0}
+
+    def on_part_begin():
+        part["headers"] = {}
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][bytes(part["field"]).lower()] = bytes(part["value"])
+        part["field"].clear()
+        part["value"].clear()
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["current"] = None
+        if b"filename" in options and len(uploads) < max_files:
+            upload = SpooledUpload(spool_bytes)
+            upload.filename = options[b"filename"].decode("utf-8", "replace")
+            uploads.append(upload)
+            part["current"] = upload
+
+    def on_part_data(data, start, end):
+        upload = part["current"]
+        if upload is None:
+            return
+        if part["received"] + (end - start) > max_bytes:
+            raise UploadRejected(413, f"Upload larger than {max_bytes} bytes")
+        part["received"] += end - start
+        upload.write(data[start:end])
+
+    def on_part_end():
+        part["current"] = None
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    def reject():
+        upload_stats["rejected"] += 1
+        for upload in uploads:
+            upload.close()
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if check_head is not None and part["current"] is not None and part["current"].size:
+                check_head(part["current"])
+        parser.finalize()
+
+        if not uploads:
+            raise UploadRejected(422, "Missing file upload")
+        if check_head is not None:
+            for upload in uploads:
+                check_head(upload, complete=True)
+    except UploadRejected:
+        reject()
+        raise
+    except Exception as e:
+        reject()
+        raise UploadRejected(400, f"Malformed upload: {str(e)}")
+
+    upload_stats["accepted"] += 1
+    upload_stats["max_upload_bytes"] = max(upload_stats["max_upload_bytes"], part["received"])
+    in_memory = sum(upload.size for upload in uploads if not upload.on_disk)
+    upload_stats["peak_memory_bytes"] = max(upload_stats["peak_memory_bytes"], in_memory)
+    upload_stats["spooled_to_disk"] += sum(1 for upload in uploads if upload.on_disk)
+    return uploads
+
+
+async def receive_upload(request, max_bytes: int = UPLOAD_MAX_BYTES, spool_bytes: int = UPLOAD_SPOOL_BYTES,
+                         check_head=None):
+    """ Premier fichier du formulaire, voir receive_files """
+    uploads = await receive_files(request, max_bytes, spool_bytes, max_files=1, check_head=check_head)
+    return uploads[0]
+
+
+async def read_image_upload(request, max_bytes: int = UPLOAD_MAX_BYTES):
+    """ Comme receive_upload, avec contrôle du format et des dimensions de l'image """
+    return await receive_upload(request, max_bytes, check_head=check_image_header)
+
+
+def read_image_stream(stream, max_bytes: int = UPLOAD_MAX_BYTES, spool_bytes: int = UPLOAD_SPOOL_BYTES,
+                      chunk_size: int = 64 * 1024):
+    """ Copie un flux (entrée d'archive, fichier) dans un SpooledUpload, avec les mêmes contrôles """
+    upload = SpooledUpload(spool_bytes)
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            if upload.size + len(chunk) > max_bytes:
+                raise UploadRejected(413, f"Image larger than {max_bytes} bytes")
+            upload.write(chunk)
+            check_image_header(upload)
+        check_image_header(upload, complete=True)
+    except Exception:
+        upload.close()
+        raise
+    return upload
@@ -0,0 +1,309 @@
+# app/ml/worker.py
+"""
+Processus d'inférence partagé entre plusieurs workers HTTP.
+
+    python -m app.ml.worker --address /tmp/kakao-inference.sock
+
+Le processus garde les interpréteurs en mémoire, une seule fois par version
+du modèle. Chaque worker HTTP s'y connecte (INFERENCE_WORKER_ADDRESS) avec une
+connexion par modèle et un anneau de mémoire partagée : INFERENCE_POOL_SIZE
+emplacements où l'API écrit les images décodées (uint8) et où le worker écrit
+les sorties. Plusieurs batches sont en vol en même temps sur la connexion, un
+par emplacement ; seuls de petits messages de contrôle passent par le socket.
+"""
+import argparse
+import os
+import queue
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+import numpy as np
+from app.config import INFERENCE_WORKER_ADDRESS, INFERENCE_WORKER_AUTHKEY, INFERENCE_MAX_BATCH_SIZE, INFERENCE_POOL_SIZE, SECRET_KEY
+from app.ml.cache import model_fingerprint
+
+
+def parse_address(address: str):
+    """ host:port pour TCP, sinon chemin d'un socket Unix """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def check_authkey(authkey: str) -> bytes:
+    """ Clé partagée par l'API et le processus d'inférence : obligatoire, et distincte de SECRET_KEY (JWT) """
+    if not authkey:
+        raise ValueError("INFERENCE_WORKER_AUTHKEY must be set to use the inference worker")
+    if authkey == SECRET_KEY:
+        raise ValueError("INFERENCE_WORKER_AUTHKEY must differ from SECRET_KEY")
+    return authkey.encode()
+
+
+def ring_size(input_details, output_details, capacity: int, slots: int) -> int:
+    """ Taille (octets) d'un anneau de slots emplacements de capacity images """
+    return ring_layout(input_details, output_details, capacity, slots)[3]
+
+
+def ring_layout(input_details, output_details, capacity: int, slots: int):
+    """ Formes d'une image et d'une sortie, début de la zone des sorties et taille totale de l'anneau """
+    image_shape = tuple(int(d) for d in input_details[0]['shape'][1:])
+    output_shape = tuple(int(d) for d in output_details[0]['shape'][1:])
+    input_bytes = slots * capacity * int(np.prod(image_shape))  # images uint8
+    output_offset = -(-input_bytes // 64) * 64  # sorties float32 alignées
+    output_bytes = slots * capacity * int(np.prod(output_shape)) * 4
+    return image_shape, output_shape, output_offset, output_offset + output_bytes
+
+
+def ring_views(buffer, input_details, output_details, capacity: int, slots: int):
+    """ Vues numpy (emplacement, image, ...) des entrées et des sorties de l'anneau """
+    image_shape, output_shape, output_offset, _ = ring_layout(input_details, output_details, capacity, slots)
+    inputs = np.ndarray((slots, capacity, *image_shape), dtype=np.uint8, buffer=buffer)
+    outputs = np.ndarray((slots, capacity, *output_shape), dtype=np.float32, buffer=buffer, offset=output_offset)
+    return inputs, outputs
+
+
+def attach_shared_memory(name: str):
+    """ Ouvre un segment créé par un autre processus, sans le supprimer à notre sortie """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    # Avant 3.13, le resource_tracker supprimerait le segment du client à l'arrêt du worker
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class WorkerClient:
+    """
+    Connexion à un processus d'inférence pour un fichier modèle ; se comporte
+    comme un interpréteur du pool (voir predict_remote), mais peut être partagé
+    par slots threads : chaque batch prend un emplacement libre de l'anneau
+    (dans l'ordre, FIFO), les réponses reviennent dans le désordre et sont
+    distribuées par un thread de lecture.
+    """
+
+    def __init__(self, address: str, model_path: str, capacity: int = INFERENCE_MAX_BATCH_SIZE,
+                 slots: int = INFERENCE_POOL_SIZE, authkey: str = INFERENCE_WORKER_AUTHKEY):
+        self.capacity = capacity
+        self.slots = max(1, slots)
+        self.shm = None
+        self.reader = None
+        self.error = None  # connexion perdue : plus aucune prédiction possible
+        self.send_lock = threading.Lock()
+        self.conn = Client(parse_address(address), authkey=check_authkey(authkey))
+        try:
+            self.conn.send(("load", os.path.abspath(model_path)))
+            status, *payload = self.conn.recv()
+            if status != "ok":
+                raise RuntimeError(f"Inference worker could not load {model_path}: {payload[0]}")
+            self.input_details, self.output_details = payload
+
+            size = ring_size(self.input_details, self.output_details, capacity, self.slots)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.inputs, self.outputs = ring_views(self.shm.buf, self.input_details, self.output_details,
+                                                   capacity, self.slots)
+            self.conn.send(("attach", self.shm.name, self.slots, capacity))
+            status, *payload = self.conn.recv()
+            if status != "ok":
+                raise RuntimeError(f"Inference worker could not attach shared memory: {payload[0]}")
+        except Exception:
+            self.close()
+            raise
+
+        self.free = queue.Queue()  # emplacements libres de l'anneau
+        for slot in range(self.slots):
+            self.free.put(slot)
+        self.done = [threading.Event() for _ in range(self.slots)]
+        self.replies = [None] * self.slots
+        self.reader = threading.Thread(target=self._read, name="inference-worker-reader", daemon=True)
+        self.reader.start()
+
+    def get_input_details(self):
+        return self.input_details
+
+    def get_output_details(self):
+        return self.output_details
+
+    def predict(self, images):
+        """ Écrit les images dans un emplacement libre, attend sa réponse et copie les sorties """
+        count = len(images)
+        if count > self.capacity:
+            raise ValueError(f"Batch of {count} images exceeds the worker buffer ({self.capacity})")
+        slot = self.free.get()
+        try:
+            for i, pixels in enumerate(images):
+                self.inputs[slot, i] = pixels
+            self.done[slot].clear()
+            if self.error is not None:
+                raise RuntimeError(f"Inference worker error: {self.error}")
+            with self.send_lock:
+                self.conn.send(("predict", slot, count))
+            self.done[slot].wait()
+            status, payload = self.replies[slot]
+            if status != "ok":
+                raise RuntimeError(f"Inference worker error: {payload}")
+            return self.outputs[slot, :count].copy()
+        finally:
+            self.free.put(slot)
+
+    def _read(self):
+        """ Réponses du worker, dans l'ordre où les batches se terminent : (statut, emplacement, détail) """
+        try:
+            while True:
+                status, slot, payload = self.conn.recv()
+                self.replies[slot] = (status, payload)
+                self.done[slot].set()
+        except (EOFError, OSError) as e:
+            self.error = f"connection closed ({e.__class__.__name__})"
+            # Débloque les batches encore en attente d'une réponse
+            for slot in range(self.slots):
+                if not self.done[slot].is_set():
+                    self.replies[slot] = ("error", self.error)
+                    self.done[slot].set()
+
+    def close(self):
+        # Appelé une fois par entrée du pool : le même client y figure slots fois
+        if self.conn is None:
+            return
+        try:
+            with self.send_lock:
+                self.conn.send(("close",))
+        except Exception:
+            pass
+        if self.reader is not None:
+            self.reader.join(5)  # le worker ferme la connexion en réponse à "close"
+        self.conn.close()
+        self.conn = None
+        if self.shm is not None:
+            # Les vues numpy doivent disparaître avant de fermer le segment
+            self.inputs = self.outputs = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+def predict_remote(client: WorkerClient, images):
+    """ Même signature que predict_images, exécutée par le processus d'inférence """
+    return client.predict(images)
+
+
+class InferenceServer:
+    """ Interpréteurs partagés par les connexions, chargés à la demande et libérés à la dernière fermeture """
+
+    def __init__(self, pool_size: int = INFERENCE_POOL_SIZE):
+        self.pool_size = pool_size
+        self.models = {}  # empreinte -> [pool, connexions]
+        self.lock = threading.Lock()
+
+    def acquire_model(self, path: str):
+        # Import tardif : le runtime n'est chargé que dans ce processus
+        from app.ml.pool import InterpreterPool
+        from app.routes.disease_detection import load_tflite_model, predict_images
+
+        key = model_fingerprint(path)
+        with self.lock:
+            if key not in self.models:
+                pool = InterpreterPool(lambda: load_tflite_model(path), size=self.pool_size)
+                self.models[key] = [pool, 0]
+                print(f"Inference worker loaded {path} ({pool.size} interpreters)")
+            self.models[key][1] += 1
+            return key, self.models[key][0], predict_images
+
+    def release_model(self, key):
+        with self.lock:
+            entry = self.models.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self.models[key]
+                entry[0].close()
+                print(f"Inference worker unloaded model {key[:8]}")
+
+    def handle(self, conn):
+        key = pool = predict = shm = inputs = outputs = executor = None
+        send_lock = threading.Lock()
+
+        def reply(*message):
+            with send_lock:
+                conn.send(message)
+
+        def run(slot, count):
+            # Un thread par emplacement en vol ; les interpréteurs restent limités par le pool du modèle
+            try:
+                outputs[slot, :count] = pool.run_sync(predict, list(inputs[slot, :count]))
+                reply("ok", slot, None)
+            except Exception as e:
+                reply("error", slot, str(e))
+
+        try:
+            while True:
+                message = conn.recv()
+                command = message[0]
+                try:
+                    if command == "load":
+                        key, pool, predict = self.acquire_model(message[1])
+                        reply("ok", pool.input_details, pool.output_details)
+                    elif command == "attach":
+                        _, name, slots, capacity = message
+                        shm = attach_shared_memory(name)
+                        inputs, outputs = ring_views(shm.buf, pool.input_details, pool.output_details, capacity, slots)
+                        executor = ThreadPoolExecutor(max_workers=slots, thread_name_prefix="inference-ring")
+                        reply("ok")
+                    elif command == "predict":
+                        executor.submit(run, message[1], message[2])
+                    elif command == "close":
+                        break
+                except Exception as e:
+                    if command == "predict":
+                        reply("error", message[1], str(e))
+                    else:
+                        reply("error", str(e))
+        except EOFError:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)  # plus d'écriture dans l'anneau avant de le fermer
+            inputs = outputs = None
+            if shm is not None:
+                shm.close()
+            if key is not None:
+                self.release_model(key)
+            conn.close()
+
+    def serve(self, address: str, authkey: str = INFERENCE_WORKER_AUTHKEY):
+        address = parse_address(address)
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)  # socket laissé par un arrêt brutal
+        with Listener(address, authkey=check_authkey(authkey)) as listener:
+            print(f"Inference worker listening on {address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"Inference worker rejected a connection: {e}")
+                    continue
+                threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+
+def stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Processus d'inférence partagé par les workers HTTP")
+    parser.add_argument("--address", default=INFERENCE_WORKER_ADDRESS or "/tmp/kakao-inference.sock")
+    parser.add_argument("--pool-size", type=int, default=INFERENCE_POOL_SIZE)
+    args = parser.parse_args()
+    # SIGTERM (docker stop) : sortie propre, le socket Unix est supprimé par Listener
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        InferenceServer(args.pool_size).serve(args.address)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
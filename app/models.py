@@ -8,6 +8,7 @@ class User(Model):
     username = fields.CharField(max_length=50, unique=True, null=True)
     password = fields.CharField(max_length=255)
     status = fields.CharField(max_length=20, default="user") # admin, farmer, user
+    city = fields.CharField(max_length=50, null=True)  # utilisée pour les statistiques de maladies par région
     
     notifications = fields.ReverseRelation["Notification"]  # Defines a reverse relation to Notification model
     products = fields.ReverseRelation["Product"]   # Defines a reverse relation to Product model
@@ -28,6 +29,8 @@ class Product(Model):
 
     class Meta:
         table = "products"
+        # Index des listes paginées (app/pagination.py) : chaque page est un parcours d'intervalle
+        indexes = (("seller_id", "id"), ("city", "id"), ("price", "id"))  # vendeur, catalogue (ville, tri par prix)
 
 
 class Order(Model):
@@ -38,9 +41,15 @@ class Order(Model):
     status = fields.CharField(max_length=20, default="pending")
     total_price = fields.FloatField()
     created_at = fields.DatetimeField(auto_now_add=True)
+    invoice_status = fields.CharField(max_length=20, null=True)  # pending, ready, failed (voir app/invoices.py)
+    invoice_path = fields.CharField(max_length=255, null=True)  # clé dans le stockage (app/storage.py)
+    invoice_attempts = fields.IntField(default=0)  # reprises du rendu de la facture (voir InvoiceRenderer.resume)
+    checkout_id = fields.CharField(max_length=32, null=True, index=True)  # commandes passées ensemble (panier)
+    stock_reserved = fields.BooleanField(default=False)  # stock déjà décompté au passage de la commande
 
     class Meta:
         table = "orders"
+        indexes = (("user_id", "id"), ("product_id", "status", "id"))
 
 class Post(Model):
     id = fields.IntField(pk=True)
@@ -53,6 +62,7 @@ class Post(Model):
 
     class Meta:
         table = "posts"
+        indexes = (("date", "id"), ("product_id", "date", "id"))
 
 class Notification(Model):
     id = fields.IntField(pk=True)
@@ -64,6 +74,7 @@ class Notification(Model):
 
     class Meta:
         table = "notifications"
+        indexes = (("user_id", "date", "id"),)
 
 class TrainingMaterial(Model):
     id = fields.IntField(pk=True)
@@ -79,3 +90,53 @@ class Like(Model):
     user_id = fields.IntField()  # ID de l'utilisateur
     material_id = fields.IntField()  # ID de l'élément
     is_liked = fields.BooleanField(default=False)  # État du like
+
+    class Meta:
+        # Une seule ligne par (utilisateur, post) : le like est basculé par un upsert (voir app/routes/likes.py)
+        unique_together = (("user_id", "material_id"),)
+        indexes = (("material_id", "is_liked", "id"),)
+
+
+class PredictionRecord(Model):
+    """ Une prédiction de /models/predict (ou d'un relevé), écrite par lots (voir app/ml/history.py) """
+    id = fields.IntField(pk=True)
+    user = fields.ForeignKeyField("models.User", related_name="predictions", null=True)
+    image_hash = fields.CharField(max_length=64, index=True)
+    predicted_class = fields.CharField(max_length=50)
+    confidence = fields.FloatField()
+    model_version = fields.CharField(max_length=100, null=True)
+    city = fields.CharField(max_length=50, null=True)  # ville de l'utilisateur au moment de la prédiction
+    created_at = fields.DatetimeField(auto_now_add=True, index=True)
+
+    class Meta:
+        table = "prediction_records"
+
+
+class PredictionRollup(Model):
+    """ Compteurs par jour, classe et ville, mis à jour à chaque écriture de PredictionRecord """
+    id = fields.IntField(pk=True)
+    day = fields.DateField()
+    predicted_class = fields.CharField(max_length=50)
+    city = fields.CharField(max_length=50, default="")  # "" : ville inconnue
+    count = fields.IntField(default=0)
+    confidence_sum = fields.FloatField(default=0)
+
+    class Meta:
+        table = "prediction_rollups"
+        unique_together = (("day", "predicted_class", "city"),)
+
+
+class IdempotencyRecord(Model):
+    """ Réponse d'une requête envoyée avec un en-tête Idempotency-Key (voir app/idempotency.py) """
+    id = fields.IntField(pk=True)
+    user_id = fields.IntField()
+    key = fields.CharField(max_length=255)
+    fingerprint = fields.CharField(max_length=64)  # hash de la méthode, du chemin et du corps
+    status_code = fields.IntField(null=True)  # None : requête en cours
+    response = fields.TextField(null=True)  # corps JSON de la réponse
+    created_at = fields.DatetimeField(auto_now_add=True)
+    expires_at = fields.DatetimeField(index=True)
+
+    class Meta:
+        table = "idempotency_records"
+        unique_together = (("user_id", "key"),)
@@ -0,0 +1,113 @@
+# app/notifier.py
+import asyncio
+from collections import defaultdict, deque
+from app.config import NOTIFICATION_DIGEST_WINDOW, NOTIFICATION_URGENT_EVENTS, NOTIFICATION_MAX_BUFFER
+from app.models import Notification
+from app.routes.notifications import send_email_notification
+
+
+class NotificationDigest:
+    """
+    Regroupe les notifications par destinataire : un seul email par fenêtre
+    de temps au lieu d'un email par événement. Les lignes Notification sont
+    écrites en une fois avec bulk_create ; celles d'un événement urgent le sont
+    tout de suite, avec l'email.
+    """
+
+    def __init__(self, window: float = NOTIFICATION_DIGEST_WINDOW, urgent_events=NOTIFICATION_URGENT_EVENTS,
+                 max_buffer: int = NOTIFICATION_MAX_BUFFER):
+        self.window = window
+        self.urgent_events = set(urgent_events)
+        self.pending = defaultdict(list)  # user_id -> [(title, content)]
+        self.emails = {}  # user_id -> email
+        self.max_buffer = max_buffer
+        # Base indisponible : le buffer plein perd les plus anciennes plutôt que la mémoire
+        self.rows = deque(maxlen=max_buffer)  # Notification à enregistrer
+        self.task = None
+        self.saves = set()  # écritures lancées hors de la boucle de digest
+        self.stats = {"events": 0, "emails": 0, "flushes": 0, "dropped": 0}
+
+    def start(self):
+        if self.task is None and self.window > 0:
+            self.task = asyncio.create_task(self._run())
+
+    def notify(self, user, event: str, title: str, content: str, urgent: bool = False):
+        """ Enregistre un événement pour un utilisateur ; les événements urgents ne sont pas différés """
+        self.stats["events"] += 1
+        if len(self.rows) >= self.max_buffer:
+            self._dropped(1)  # la plus ancienne sort du deque à l'append
+        self.rows.append(Notification(user_id=user.id, title=title, content=content))
+
+        if urgent or event in self.urgent_events or self.task is None:
+            send_email_notification(user.email, title, content)
+            self.stats["emails"] += 1
+            # Urgent (ou pas de boucle de digest) : la notification est écrite avec l'email, pas au prochain digest
+            save = asyncio.get_running_loop().create_task(self._save_rows())
+            self.saves.add(save)
+            save.add_done_callback(self._saved)
+            return
+
+        self.pending[user.id].append((title, content))
+        self.emails[user.id] = user.email
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.window)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Failed to flush notifications: {e}")
+
+    async def flush(self):
+        """ Envoie un email par destinataire et enregistre les notifications en attente """
+        pending, self.pending = self.pending, defaultdict(list)
+        emails, self.emails = self.emails, {}
+        self.stats["flushes"] += 1
+
+        for user_id, events in pending.items():
+            if len(events) == 1:
+                title, content = events[0]
+            else:
+                title = f"You have {len(events)} new notifications"
+                content = "\n\n".join(f"- {t}\n  {c}" for t, c in events)
+            send_email_notification(emails[user_id], title, content)
+            self.stats["emails"] += 1
+
+        await self._save_rows()
+
+    def _saved(self, save):
+        self.saves.discard(save)
+        if not save.cancelled() and save.exception() is not None:
+            print(f"Failed to save notifications: {save.exception()}")
+
+    def _dropped(self, count: int):
+        self.stats["dropped"] += count
+        print(f"Notification buffer full ({self.max_buffer}): dropped {count} unsaved notification(s)")
+
+    async def _save_rows(self):
+        rows = list(self.rows)
+        self.rows.clear()
+        if not rows:
+            return
+        try:
+            await Notification.bulk_create(rows)
+        except Exception:
+            # Remises en tête du buffer pour la prochaine écriture, sans dépasser max_buffer
+            overflow = len(self.rows) + len(rows) - self.max_buffer
+            if overflow > 0:
+                rows = rows[overflow:]
+                self._dropped(overflow)
+            self.rows.extendleft(reversed(rows))
+            raise
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.saves:
+            await asyncio.gather(*self.saves, return_exceptions=True)
+        await self.flush()
+
+
+notifier = NotificationDigest()
@@ -0,0 +1,94 @@
+# app/pagination.py
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Query
+from tortoise import fields
+from tortoise.expressions import Q
+from app.config import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT
+
+
+@dataclass
+class Page:
+    cursor: Optional[str]
+    limit: int
+
+
+def page_params(cursor: Optional[str] = None, limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT)) -> Page:
+    """ Dépendance des routes de liste : ?cursor=...&limit=... """
+    return Page(cursor=cursor, limit=limit)
+
+
+def encode_cursor(values: list) -> str:
+    data = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, ordering, model=None) -> list:
+    """ Valeurs du curseur, converties selon le type des champs de `model` (dates) """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError(cursor)
+        decoded = []
+        for field, value in zip(ordering, values):
+            if not isinstance(value, (int, float, str)):
+                raise ValueError(cursor)
+            field_object = model._meta.fields_map.get(field.lstrip("-")) if model else None
+            if isinstance(field_object, fields.IntField) and not isinstance(value, int):
+                raise ValueError(cursor)
+            decoded.append(datetime.fromisoformat(value) if isinstance(field_object, fields.DatetimeField) else value)
+        return decoded
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after(ordering, values) -> Q:
+    """
+    Lignes situées après `values` dans l'ordre `ordering`, par exemple pour
+    ("-date", "-id") : date < d OU (date = d ET id < i). Avec l'index
+    correspondant, chaque page est un parcours d'intervalle de l'index.
+    """
+    conditions = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        equal = {f.lstrip("-"): value for f, value in zip(ordering[:i], values[:i])}
+        conditions.append(Q(**equal, **{f"{name}__{'lt' if field.startswith('-') else 'gt'}": values[i]}))
+    return Q(*conditions, join_type="OR")
+
+
+async def paginate(query, page: Page, ordering=("-id",)):
+    """
+    Une page de `query` triée par `ordering` (le dernier champ doit être id,
+    pour que l'ordre soit total) : (lignes, curseur de la page suivante ou
+    None), à renvoyer sous la forme {"items": ..., "next_cursor": ...}.
+    """
+    if page.cursor:
+        query = query.filter(after(ordering, decode_cursor(page.cursor, ordering, query.model)))
+    rows = list(await query.order_by(*ordering).limit(page.limit + 1))
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor([getattr(rows[-1], field.lstrip("-")) for field in ordering])
+    return rows, next_cursor
+
+
+async def paginate_ranked(search, page: Page):
+    """
+    Pagination de résultats classés par pertinence, sans clé de tri stockée en
+    base : le curseur est la position dans le classement. search(offset, limit)
+    renvoie les ids dans l'ordre ; renvoie (ids, curseur ou None).
+    """
+    offset = decode_cursor(page.cursor, ("offset",))[0] if page.cursor else 0
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    ids = await search(offset, page.limit + 1)
+
+    next_cursor = None
+    if len(ids) > page.limit:
+        ids = ids[:page.limit]
+        next_cursor = encode_cursor([offset + page.limit])
+    return ids, next_cursor
@@ -1,19 +1,57 @@
+import time
+IMPORT_STARTED = time.perf_counter()
 
+import asyncio
+import ipaddress
 import os
 import requests
 import zipfile
-from fastapi import FastAPI, APIRouter, File, UploadFile
-from fastapi.responses import JSONResponse
+from collections import Counter
+from datetime import date, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from PIL import Image
-import io
 import numpy as np
-import tensorflow as tf
+from app.config import (
+    INFERENCE_BACKEND, INFERENCE_NUM_THREADS, INFERENCE_XNNPACK, INFERENCE_RESIZE_FILTER, INFERENCE_WORKER_ADDRESS,
+    INFERENCE_MAX_BATCH_SIZE, TRUSTED_PROXIES,
+    INFERENCE_TUNING, INFERENCE_TUNING_FILE,
+    SURVEY_MAX_BYTES, SURVEY_MAX_IMAGES, SURVEY_BATCH_SIZE,
+)
+from app.ml.backends import BatchedInterpreter, resolve_backend, interpreter_options, quantize_input, dequantize_output
+from app.ml.cache import PredictionCache
+from app.ml.model import ModelHandle
+from app.ml.registry import ModelRegistry
+from app.ml.admission import AdmissionController, Overloaded
+from app.ml.uploads import UploadRejected, read_image_upload, receive_files, upload_stats
+from app.ml.surveys import SurveyJob, SurveyManager, survey_entries
+from app.ml.worker import WorkerClient, predict_remote
+from app.ml.history import history
+from app.models import PredictionRollup
+from app.schemas import PredictionAggregate
+from app.auth import get_current_user, get_optional_user, is_admin
 
 router = APIRouter(prefix="/models", tags=["models"])
 
 FILE_ID = "1ji-PAZZOVxl5AuiM1_BRIz1qSvMoIKny"
 ZIP_PATH = "model_kakao_farmer_app.zip"
-MODEL_PATH = "model.tflite"  # The actual .tflite file name inside the zip
+MODEL_PATH = os.getenv("MODEL_PATH", "model.tflite")  # The actual .tflite file name inside the zip
+
+# Le runtime (tflite_runtime, tensorflow ou numpy) n'est importé qu'au chargement du modèle
+runtime = None
+
+# État du chargement en arrière-plan au démarrage (voir start_model_loading)
+model_status = {
+    "ready": False,
+    "error": None,
+    "version": None,
+    "import_seconds": None,
+    "backend": None,
+    "runtime_import_seconds": None,
+    "load_seconds": None,
+    "warmup_seconds": None,
+}
 
 def download_and_extract_model():
     """Downloads the model from Google Drive and extracts it if not present."""
@@ -39,16 +77,29 @@ def download_and_extract_model():
         # Clean up zip file
         os.remove(ZIP_PATH)
 
-def load_tflite_model(model_path):
-    """Load TFLite model from file."""
+def import_runtime():
+    """Import the inference runtime on first use and record how long it took."""
+    global runtime
+    if runtime is None:
+        start = time.perf_counter()
+        runtime = resolve_backend(INFERENCE_BACKEND)
+        model_status["backend"] = runtime[0]
+        model_status["runtime_import_seconds"] = time.perf_counter() - start
+    return runtime
+
+def load_tflite_model(model_path, num_threads=INFERENCE_NUM_THREADS, xnnpack=INFERENCE_XNNPACK,
+                      max_batch_size=INFERENCE_MAX_BATCH_SIZE):
+    """Load TFLite model from file, with tensors allocated once per batch size bucket."""
     if not os.path.exists(model_path):
         download_and_extract_model()
+    backend, Interpreter = import_runtime()
     
     try:
         # Load the TFLite model and allocate tensors
-        interpreter = tf.lite.Interpreter(model_path=model_path)
-        interpreter.allocate_tensors()
-        return interpreter
+        return BatchedInterpreter(
+            lambda: Interpreter(model_path=model_path, num_threads=num_threads, **interpreter_options(backend, xnnpack)),
+            max_batch_size,
+        )
     except Exception as e:
         raise ValueError(f"Error loading model: {str(e)}. Please ensure the model file is a valid TFLite model.")
 
@@ -81,47 +132,76 @@ disease_info = {
     }
 }
 
-# Initialize the interpreter
-try:
-    interpreter = load_tflite_model(MODEL_PATH)
-    input_details = interpreter.get_input_details()
-    output_details = interpreter.get_output_details()
-except Exception as e:
-    print(f"Error initializing model: {str(e)}")
-    raise
+CLASS_NAMES = ["black_pod_rot", "healthy", "pod_borer"]
+
+# Filtres de redimensionnement sélectionnables via INFERENCE_RESIZE_FILTER
+RESAMPLE_FILTERS = {
+    "nearest": Image.NEAREST,
+    "box": Image.BOX,
+    "bilinear": Image.BILINEAR,
+    "hamming": Image.HAMMING,
+    "bicubic": Image.BICUBIC,
+    "lanczos": Image.LANCZOS,
+}
+
+def decode_image(image, target_size=(224, 224), resample=INFERENCE_RESIZE_FILTER):
+    """Decode and resize an image, returning a (H, W, 3) uint8 array."""
+    # JPEG : décoder directement à l'échelle réduite (1/2, 1/4, 1/8) la plus proche de la cible
+    image.draft('RGB', target_size)
 
-def preprocess_image(image, target_size=(224, 224)):
-    """Preprocess image for model input."""
     # Convert to RGB if needed
     if image.mode != 'RGB':
         image = image.convert('RGB')
-    
+
     # Resize image
-    image = image.resize(target_size, Image.LANCZOS)
-    
-    # Convert to numpy array and normalize
-    image_array = np.array(image, dtype=np.float32)
-    image_array = image_array / 255.0
-    
-    # Add batch dimension
-    image_array = np.expand_dims(image_array, axis=0)
-    
-    return image_array
+    image = image.resize(target_size, RESAMPLE_FILTERS[resample])
+    return np.asarray(image)
 
-def predict_with_tflite(interpreter, image_array):
-    """Run prediction on the image using the TFLite model."""
-    # Get input details
+def normalize_into(pixels, out):
+    """Write pixels / 255 into a preallocated float32 buffer, without temporary arrays."""
+    np.multiply(pixels, np.float32(1 / 255), out=out, casting="unsafe")
+    return out
+
+def preprocess_image(image, target_size=(224, 224), out=None):
+    """Preprocess image for model input."""
+    pixels = decode_image(image, target_size)
+
+    # Normalize into a (1, H, W, 3) float32 array, reused when out is given
+    if out is None:
+        out = np.empty((1, *pixels.shape), dtype=np.float32)
+    normalize_into(pixels, out[0])
+
+    return out
+
+def _prepare_batch(interpreter, batch_size):
+    """Pick the interpreter allocated for this batch size and return it with its tensor details."""
+    # Les tenseurs ne sont jamais réalloués ici : batch complété jusqu'à la taille allouée
+    if isinstance(interpreter, BatchedInterpreter):
+        interpreter = interpreter.for_batch(batch_size)
     input_details = interpreter.get_input_details()
     output_details = interpreter.get_output_details()
-    
+
+    if batch_size > input_details[0]['shape'][0]:
+        raise ValueError(f"Batch of {batch_size} images exceeds the allocated input tensor {input_details[0]['shape']}")
+    return interpreter, input_details, output_details
+
+def predict_with_tflite(interpreter, image_array):
+    """Run prediction on the image using the TFLite model."""
+    count = image_array.shape[0]
+    interpreter, input_details, output_details = _prepare_batch(interpreter, count)
+
     # Check and prepare input
     input_shape = input_details[0]['shape']
-    required_dtype = input_details[0]['dtype']
-    
-    # Ensure input matches required shape and type
-    if image_array.shape != tuple(input_shape):
-        image_array = np.resize(image_array, input_shape)
-    image_array = image_array.astype(required_dtype)
+
+    # Ensure input matches required shape and type (quantization int8/uint8 si besoin)
+    if image_array.shape[1:] != tuple(input_shape[1:]):
+        image_array = np.resize(image_array, (count, *input_shape[1:]))
+    if count < input_shape[0]:
+        # Lignes de remplissage jusqu'à la taille de batch allouée
+        padded = np.zeros(input_shape, dtype=image_array.dtype)
+        padded[:count] = image_array
+        image_array = padded
+    image_array = quantize_input(image_array, input_details[0])
     
     # Set input tensor
     interpreter.set_tensor(input_details[0]['index'], image_array)
@@ -130,29 +210,283 @@ def predict_with_tflite(interpreter, image_array):
     interpreter.invoke()
     
     # Get output tensor
-    output_data = interpreter.get_tensor(output_details[0]['index'])
-    return output_data
+    output_data = interpreter.get_tensor(output_details[0]['index'])[:count]
+    return dequantize_output(output_data, output_details[0])
+
+def predict_images(interpreter, images):
+    """Run prediction on decoded uint8 images, normalizing them straight into the input tensor."""
+    count = len(images)
+    interpreter, input_details, output_details = _prepare_batch(interpreter, count)
+
+    if input_details[0]['dtype'] != np.float32:
+        batch = np.empty((count, *images[0].shape), dtype=np.float32)
+        for i, pixels in enumerate(images):
+            normalize_into(pixels, batch[i])
+        return predict_with_tflite(interpreter, batch)
+
+    # Le tenseur d'entrée de l'interpréteur sert de buffer préalloué
+    buffer = interpreter.tensor(input_details[0]['index'])()
+    for i, pixels in enumerate(images):
+        normalize_into(pixels, buffer[i])
+    buffer[count:] = 0  # remplissage
+    # invoke() refuse de tourner tant qu'une vue sur les tenseurs internes existe
+    del buffer
+
+    interpreter.invoke()
+    return dequantize_output(interpreter.get_tensor(output_details[0]['index'])[:count], output_details[0])
+
+# Cache des prédictions pour les photos renvoyées plusieurs fois
+prediction_cache = PredictionCache()
+
+# Limite les prédictions en attente (globalement et par client)
+admission = AdmissionController()
+
+# Relevés terrain analysés en tâche de fond (POST /models/surveys/)
+surveys = SurveyManager()
+
+def load_handle(path, version=None):
+    """Build the interpreter pool for one model file and run the warmup inference."""
+    if INFERENCE_WORKER_ADDRESS:
+        # Interpréteurs dans le processus d'inférence partagé : ni runtime ni modèle chargés ici
+        model_status["backend"] = f"worker:{INFERENCE_WORKER_ADDRESS}"
+        # Une seule connexion (et un seul anneau) par modèle : chaque entrée du pool la partage, un emplacement par inférence
+        client = WorkerClient(INFERENCE_WORKER_ADDRESS, path)
+        handle = ModelHandle(path, lambda: client, predict_remote, version=version)
+    else:
+        handle = ModelHandle(path, lambda: load_tflite_model(path), predict_images, version=version)
+    handle.warmup()
+    return handle
+
+def load_model_sync():
+    """Load the single MODEL_PATH model, downloading it if needed (scripts and benchmarks)."""
+    if not os.path.exists(MODEL_PATH):
+        download_and_extract_model()
+    return load_handle(MODEL_PATH)
+
+def on_model_activated(handle):
+    """Called by the registry each time a model version becomes active."""
+    prediction_cache.set_model(handle.fingerprint)
+    admission.capacity = handle.pool.size * handle.batcher.max_batch_size
+    model_status.update(
+        ready=True,
+        error=None,
+        version=handle.version,
+        load_seconds=handle.load_seconds,
+        warmup_seconds=handle.warmup_seconds,
+    )
+    print(f"Model {handle.version} ready (load {handle.load_seconds:.2f}s, warmup {handle.warmup_seconds:.2f}s)")
+
+# Versions du modèle (MODELS_DIR) ; registry.active est le modèle qui sert les requêtes
+registry = ModelRegistry(load_handle, on_activate=on_model_activated)
+
+async def load_model():
+    """Load the latest model version in a worker thread, then watch MODELS_DIR for new ones."""
+    try:
+        await asyncio.to_thread(registry.scan)
+        if not registry.versions:
+            # Pas de dossier de versions : modèle unique historique, téléchargé si absent
+            await asyncio.to_thread(download_and_extract_model)
+            registry.register(MODEL_PATH)
+        await registry.activate(registry.latest())
+    except Exception as e:
+        model_status["error"] = str(e)
+        print(f"Error initializing model: {str(e)}")
+    registry.start()
+
+_loading_task = None
+
+def start_model_loading():
+    """Start loading the model in the background; called from the app startup."""
+    global _loading_task
+    if _loading_task is None:
+        _loading_task = asyncio.create_task(load_model())
+
+async def close_model():
+    if _loading_task is not None and not _loading_task.done():
+        _loading_task.cancel()
+    await surveys.stop()
+    await registry.stop()
+
+def not_ready_response():
+    """Fast 503 returned while the model is still loading."""
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "5"},
+        content={
+            "status": "error",
+            "message": model_status["error"] or "Model is loading, retry shortly"
+        }
+    )
+
+def queue_headers():
+    """Queue depth and estimated wait, so clients can back off."""
+    return {
+        "X-Queue-Depth": str(admission.pending),
+        "X-Estimated-Wait": f"{admission.estimated_wait():.2f}",
+    }
+
+def overloaded_response(error: Overloaded):
+    """Fast 503 returned when the prediction queue is full."""
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(error.retry_after), **queue_headers()},
+        content={
+            "status": "error",
+            "message": error.reason,
+            "queue_depth": admission.pending,
+            "estimated_wait_seconds": admission.estimated_wait(),
+        }
+    )
+
+# Réseaux des reverse proxies de confiance (TRUSTED_PROXIES)
+trusted_proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in TRUSTED_PROXIES]
+
+def is_trusted_proxy(host):
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies)
+
+def client_ip(request: Request):
+    """Client address; X-Forwarded-For is only honored when the connection comes from a trusted proxy."""
+    host = request.client.host if request.client else None
+    if host is None or not is_trusted_proxy(host):
+        return host or "unknown"
+    # Chaque proxy ajoute l'adresse qu'il a vue à droite : la première non fiable en partant de la fin est le client
+    for forwarded in reversed(request.headers.get("x-forwarded-for", "").split(",")):
+        forwarded = forwarded.strip()
+        if forwarded and not is_trusted_proxy(forwarded):
+            return forwarded
+    return host
+
+def client_key(request: Request, current_user=None):
+    """Identify the caller for the per-client limit: user id, else client IP."""
+    if current_user is not None:
+        return f"user:{current_user.id}"
+    return f"ip:{client_ip(request)}"
+
+@router.get("/queue")
+async def prediction_queue():
+    """Current queue depth and estimated wait for /models/predict/."""
+    return admission.info
 
-@router.post("/predict/")
-async def predict(file: UploadFile = File(...)):
+@router.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before."""
+    status_code = 200 if model_status["ready"] else 503
+    return JSONResponse(status_code=status_code, content=model_status)
+
+@router.get("/stats")
+async def inference_stats():
+    """Counters about the observed inference batches and the prediction cache."""
+    model = registry.active
+    return {
+        "model": model.info if model else None,
+        "batcher": model.batcher.stats if model else None,
+        "cache": prediction_cache.info,
+        "admission": admission.info,
+        "uploads": upload_stats,
+        "surveys": surveys.info,
+        "history": history.info,
+        "tuning": {"file": INFERENCE_TUNING_FILE if INFERENCE_TUNING else None, **INFERENCE_TUNING},
+        "startup": model_status,
+    }
+
+# Versions du modèle (administration)
+@router.get("/versions", dependencies=[Depends(is_admin)])
+async def list_model_versions():
+    """List the known model versions and the active one."""
+    return {
+        "active": registry.active.version if registry.active else None,
+        "history": registry.history,
+        "versions": registry.describe(),
+    }
+
+@router.post("/versions/{version}/activate", dependencies=[Depends(is_admin)])
+async def activate_model_version(version: str):
+    """Load, warm up and switch to the given model version."""
+    try:
+        handle = await registry.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Model version not found")
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Model version failed to load: {str(e)}")
+    return {"msg": f"Model {handle.version} is active"}
+
+@router.post("/rollback", dependencies=[Depends(is_admin)])
+async def rollback_model(version: Optional[str] = None):
+    """Switch back to the previous active version, or to the given one."""
+    try:
+        handle = await registry.rollback(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="No version to roll back to")
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Model version failed to load: {str(e)}")
+    return {"msg": f"Model {handle.version} is active"}
+
+# Le corps multipart est lu dans la route, après le contrôle d'admission
+PREDICT_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
+
+@router.post("/predict/", openapi_extra=PREDICT_REQUEST_BODY)
+async def predict(request: Request, current_user=Depends(get_optional_user)):
     """Endpoint for making predictions on uploaded images."""
+    model = registry.active
+    if model is None:
+        return not_ready_response()
+
     try:
-        # Read and preprocess image
-        image_data = await file.read()
-        image = Image.open(io.BytesIO(image_data))
-        processed_image = preprocess_image(image)
-        
-        # Make prediction
-        predictions = predict_with_tflite(interpreter, processed_image)
-        class_idx = np.argmax(predictions[0])
-        
-        # Get class names and probabilities
-        class_names = ["black_pod_rot", "healthy", "pod_borer"]
-        predicted_class = class_names[class_idx]
+        # Refus immédiat si la file est pleine, avant même de lire l'image
+        async with admission.admit(client_key(request, current_user)):
+            # La requête garde sa version du modèle jusqu'au bout, même si une autre est activée entre-temps
+            async with model.use():
+                # Lecture par morceaux, bornée en taille ; format et dimensions vérifiés sur l'en-tête
+                upload = await read_image_upload(request)
+                try:
+                    # Même fichier déjà analysé (renvoi après coupure réseau) : pas de nouvelle inférence
+                    cache_key = upload.sha256
+                    cached = await prediction_cache.lookup(cache_key)
+
+                    # Get class names and probabilities
+                    class_names = CLASS_NAMES
+
+                    if cached is not None:
+                        predictions, predicted_class = cached
+                        class_idx = class_names.index(predicted_class)
+                    else:
+                        image = upload.open_image()
+                        # Le décodage et le redimensionnement sont faits hors de la boucle asyncio
+                        pixels = await asyncio.to_thread(decode_image, image, model.input_size)
+
+                        # Make prediction
+                        predictions = await model.submit(pixels)
+                        class_idx = int(np.argmax(predictions[0]))
+                        predicted_class = class_names[class_idx]
+                        await prediction_cache.store(cache_key, predictions, predicted_class, model=model.fingerprint)
+                finally:
+                    upload.close()
+
+        # Historique écrit plus tard, par lots : pas d'accès base dans la requête
+        history.record(current_user, cache_key, predicted_class, float(predictions[0][class_idx]), model.version)
         
         # Prepare detailed response
         result = {
             "status": "success",
+            "cached": cached is not None,
+            "model_version": model.version,
             "predicted_class": predicted_class,
             "confidence": float(predictions[0][class_idx]),
             "predictions": {
@@ -162,8 +496,18 @@ async def predict(file: UploadFile = File(...)):
             "disease_info": disease_info[predicted_class]
         }
         
-        return JSONResponse(content=result)
-        
+        return JSONResponse(content=result, headers=queue_headers())
+
+    except Overloaded as e:
+        return overloaded_response(e)
+    except UploadRejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={
+                "status": "error",
+                "message": e.reason
+            }
+        )
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -171,4 +515,205 @@ async def predict(file: UploadFile = File(...)):
                 "status": "error",
                 "message": str(e)
             }
-        )
\ No newline at end of file
+        )
+
+# Relevés terrain : une archive ou un lot d'images, résultats en NDJSON
+def open_survey_batch(entries, size):
+    """Open and check the next `size` images of a survey: [(name, upload or None, error)]."""
+    batch = []
+    for name, open_entry in entries:
+        try:
+            batch.append((name, open_entry(), None))
+        except Exception as e:
+            batch.append((name, None, getattr(e, "reason", str(e))))
+        if len(batch) >= size:
+            break
+    return batch
+
+def decode_survey_images(uploads, target_size):
+    """Decode the images that missed the cache; errors are returned instead of raised."""
+    decoded = []
+    for upload in uploads:
+        try:
+            decoded.append(decode_image(upload.open_image(), target_size))
+        except Exception as e:
+            decoded.append(e)
+    return decoded
+
+def survey_result(name, image_hash, predictions, cached):
+    class_idx = int(np.argmax(predictions))
+    return {
+        "filename": name,
+        "image_hash": image_hash,
+        "status": "success",
+        "cached": cached,
+        "predicted_class": CLASS_NAMES[class_idx],
+        "confidence": float(predictions[class_idx]),
+        "predictions": {name: float(prob) for name, prob in zip(CLASS_NAMES, predictions)},
+    }
+
+async def process_survey(job, uploads, user=None):
+    """Run every image of the survey through the model, SURVEY_BATCH_SIZE at a time."""
+    model = registry.active
+    if model is None:
+        raise RuntimeError(model_status["error"] or "Model is not loaded")
+    job.model_version = model.version
+
+    async with model.use():
+        entries = survey_entries(uploads)
+        while True:
+            # Lecture de l'archive et décodage hors de la boucle asyncio
+            batch = await asyncio.to_thread(open_survey_batch, entries, SURVEY_BATCH_SIZE)
+            if not batch:
+                break
+
+            results = [None] * len(batch)
+            misses = []
+            for i, (name, upload, error) in enumerate(batch):
+                if upload is None:
+                    results[i] = {"filename": name, "status": "error", "message": error}
+                    continue
+                cached = await prediction_cache.lookup(upload.sha256)
+                if cached is not None:
+                    results[i] = survey_result(name, upload.sha256, cached[0][0], cached=True)
+                else:
+                    misses.append(i)
+
+            decoded = await asyncio.to_thread(decode_survey_images, [batch[i][1] for i in misses], model.input_size)
+            for _, upload, _ in batch:
+                if upload is not None:
+                    upload.close()
+
+            # Les images du lot partent ensemble dans le batcher, qui les regroupe par batch
+            pending = [(i, pixels) for i, pixels in zip(misses, decoded) if not isinstance(pixels, Exception)]
+            outputs = await asyncio.gather(*(model.submit(pixels) for _, pixels in pending), return_exceptions=True)
+            for i, pixels in zip(misses, decoded):
+                if isinstance(pixels, Exception):
+                    results[i] = {"filename": batch[i][0], "status": "error", "message": str(pixels)}
+            for (i, _), predictions in zip(pending, outputs):
+                name, upload, _ = batch[i]
+                if isinstance(predictions, Exception):
+                    results[i] = {"filename": name, "status": "error", "message": str(predictions)}
+                    continue
+                results[i] = survey_result(name, upload.sha256, predictions[0], cached=False)
+                await prediction_cache.store(upload.sha256, predictions, results[i]["predicted_class"], model=model.fingerprint)
+
+            for result in results:
+                if result["status"] == "success":
+                    history.record(user, result.pop("image_hash"), result["predicted_class"], result["confidence"], model.version)
+                await job.add(result)
+
+def get_survey_job(job_id, current_user):
+    """A survey is visible to the user who sent it (and to admins)."""
+    job = surveys.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    if job.owner is not None:
+        if current_user is None or (current_user.id != job.owner and current_user.status != "admin"):
+            raise HTTPException(status_code=404, detail="Survey not found")
+    return job
+
+def survey_links(job):
+    return {
+        "status_url": f"/models/surveys/{job.id}",
+        "results_url": f"/models/surveys/{job.id}/results",
+    }
+
+SURVEY_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                    },
+                    "required": ["files"],
+                }
+            }
+        },
+    }
+}
+
+@router.post("/surveys/", status_code=202, openapi_extra=SURVEY_REQUEST_BODY)
+async def create_survey(request: Request, current_user=Depends(get_optional_user)):
+    """Start a survey job from a zip archive or many images; send `Accept: application/x-ndjson` to stream results."""
+    if registry.active is None:
+        return not_ready_response()
+
+    try:
+        uploads = await receive_files(request, SURVEY_MAX_BYTES, max_files=SURVEY_MAX_IMAGES)
+    except UploadRejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={
+                "status": "error",
+                "message": e.reason
+            }
+        )
+
+    def cleanup():
+        for upload in uploads:
+            upload.close()
+
+    job = SurveyJob(owner=current_user.id if current_user is not None else None)
+    surveys.submit(job, lambda job: process_survey(job, uploads, current_user), cleanup=cleanup)
+    headers = {"X-Job-Id": job.id, "Location": f"/models/surveys/{job.id}"}
+
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(job.ndjson(), media_type="application/x-ndjson", headers=headers)
+    return JSONResponse(
+        status_code=202,
+        headers=headers,
+        content={"job_id": job.id, "status": job.status, **survey_links(job)}
+    )
+
+@router.get("/surveys/{job_id}")
+async def survey_status(job_id: str, current_user=Depends(get_optional_user)):
+    """Progress and per-class summary of a survey job."""
+    job = get_survey_job(job_id, current_user)
+    return {**job.summary, **survey_links(job)}
+
+@router.get("/surveys/{job_id}/results")
+async def survey_results(job_id: str, current_user=Depends(get_optional_user)):
+    """Per-image results as NDJSON, followed live until the job ends, then the summary line."""
+    job = get_survey_job(job_id, current_user)
+    return StreamingResponse(job.ndjson(), media_type="application/x-ndjson", headers={"X-Job-Id": job.id})
+
+# Historique des prédictions : compteurs par jour, classe et ville
+@router.get("/history/aggregates")
+async def prediction_aggregates(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    city: Optional[str] = None,
+    predicted_class: Optional[str] = None,
+    current_user=Depends(get_current_user),
+):
+    """Daily prediction counts per class and city (30 last days by default), read from the rollup table."""
+    end = end or date.today()
+    start = start or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+
+    query = PredictionRollup.filter(day__gte=start, day__lte=end)
+    if city is not None:
+        query = query.filter(city=city)
+    if predicted_class is not None:
+        query = query.filter(predicted_class=predicted_class)
+    rollups = await query.order_by("day", "predicted_class", "city")
+
+    totals = Counter()
+    rows = []
+    for rollup in rollups:
+        totals[rollup.predicted_class] += rollup.count
+        rows.append(PredictionAggregate(
+            day=rollup.day,
+            predicted_class=rollup.predicted_class,
+            city=rollup.city or None,
+            count=rollup.count,
+            average_confidence=rollup.confidence_sum / rollup.count if rollup.count else 0.0,
+        ))
+    return {"start": start.isoformat(), "end": end.isoformat(), "totals": dict(totals), "rows": rows}
+
+model_status["import_seconds"] = time.perf_counter() - IMPORT_STARTED
\ No newline at end of file
@@ -1,12 +1,183 @@
-# app/formations.py
-import smtplib
-from email.mime.text import MIMEText
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException
-from app.models import Formation
-from app.schemas import FormationResponse, VideoFormationCreate, TextFormationCreate
+# app/routers/likes.py
+import time
+from collections import OrderedDict
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+from app.models import Like, Post as PostModel, User
 from app.auth import get_current_user
-from datetime import datetime
+from app.config import LIKES_CACHE_TTL, LIKES_CACHE_MAX_USERS, LIKES_CACHE_MAX_POSTS
+from app.pagination import Page, page_params, paginate
+from app.schemas import LikerPage
 
-router = APIRouter(prefix="/likes", tags=["formations"])
+router = APIRouter(prefix="/likes", tags=["likes"])
 
+# Basculer le like en une requête : insertion au premier like, inversion ensuite.
+# La contrainte unique (user_id, material_id) garantit une seule ligne par utilisateur et par post.
+TOGGLE_SQL = {
+    "postgres": (
+        'INSERT INTO "{table}" (user_id, material_id, is_liked) VALUES ($1, $2, TRUE) '
+        'ON CONFLICT (user_id, material_id) DO UPDATE SET is_liked = NOT "{table}".is_liked RETURNING is_liked'
+    ),
+    "sqlite": (
+        'INSERT INTO "{table}" (user_id, material_id, is_liked) VALUES (?, ?, 1) '
+        'ON CONFLICT (user_id, material_id) DO UPDATE SET is_liked = NOT is_liked RETURNING is_liked'
+    ),
+}
+
+# Compteur incrémenté et relu dans la même requête
+COUNT_SQL = {
+    "postgres": 'UPDATE "{table}" SET likes_count = likes_count + $1 WHERE id = $2 RETURNING likes_count',
+    "sqlite": 'UPDATE "{table}" SET likes_count = likes_count + ? WHERE id = ? RETURNING likes_count',
+}
+
+
+async def toggle(user_id: int, post_id: int, conn) -> bool:
+    """ Bascule le like de l'utilisateur ; renvoie le nouvel état """
+    sql = TOGGLE_SQL.get(conn.capabilities.dialect)
+    if sql is None:
+        # Autres bases : verrou sur la ligne, puis création ou inversion
+        like = await Like.filter(user_id=user_id, material_id=post_id).using_db(conn).select_for_update().first()
+        if like is None:
+            await Like.create(user_id=user_id, material_id=post_id, is_liked=True, using_db=conn)
+            return True
+        await Like.filter(id=like.id).using_db(conn).update(is_liked=not like.is_liked)
+        return not like.is_liked
+    rows = await conn.execute_query_dict(sql.format(table=Like._meta.db_table), [user_id, post_id])
+    return bool(rows[0]["is_liked"])
+
+
+async def add_likes(post_id: int, delta: int, conn):
+    """ likes_count += delta ; renvoie le nouveau compteur, ou None si le post n'existe pas """
+    sql = COUNT_SQL.get(conn.capabilities.dialect)
+    if sql is None:
+        if not await PostModel.filter(id=post_id).using_db(conn).update(likes_count=F("likes_count") + delta):
+            return None
+        return (await PostModel.filter(id=post_id).using_db(conn).values_list("likes_count", flat=True))[0]
+    rows = await conn.execute_query_dict(sql.format(table=PostModel._meta.db_table), [delta, post_id])
+    return rows[0]["likes_count"] if rows else None
+
+
+class LikedPostsCache:
+    """
+    Posts likés par chaque utilisateur, gardés en mémoire (LRU par utilisateur, TTL).
+
+    Pour un utilisateur : les posts dont l'état est connu et, parmi eux, ceux
+    qu'il a likés. Les posts inconnus sont lus en une requête material_id__in ;
+    toggle_like met le cache à jour. Un like fait dans un autre processus de
+    l'API est vu à l'expiration de l'entrée.
+    """
+
+    def __init__(self, ttl: float = LIKES_CACHE_TTL, max_users: int = LIKES_CACHE_MAX_USERS,
+                 max_posts: int = LIKES_CACHE_MAX_POSTS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.max_posts = max_posts
+        self.users = OrderedDict()  # user_id -> (expires_at, posts connus, posts likés)
+        self.stats = {"hits": 0, "misses": 0, "queries": 0}
+
+    def _entry(self, user_id: int):
+        entry = self.users.get(user_id)
+        if entry is None or entry[0] < time.time() or len(entry[1]) > self.max_posts:
+            entry = (time.time() + self.ttl, set(), set())
+            self.users[user_id] = entry
+        self.users.move_to_end(user_id)
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+        return entry
+
+    async def liked(self, user_id: int, post_ids) -> set:
+        """ Sous-ensemble de post_ids liké par l'utilisateur ; au plus une requête """
+        _, known, liked = self._entry(user_id)
+        missing = [post_id for post_id in set(post_ids) if post_id not in known]
+        self.stats["hits"] += len(set(post_ids)) - len(missing)
+        if missing:
+            self.stats["misses"] += len(missing)
+            self.stats["queries"] += 1
+            rows = set(await Like.filter(user_id=user_id, material_id__in=missing, is_liked=True).values_list("material_id", flat=True))
+            # Posts renseignés par set() (toggle_like) pendant la requête : leur état est plus récent que ces lignes
+            fresh = [post_id for post_id in missing if post_id not in known]
+            known.update(fresh)
+            liked.update(post_id for post_id in fresh if post_id in rows)
+        return liked.intersection(post_ids)
+
+    def set(self, user_id: int, post_id: int, is_liked: bool):
+        entry = self.users.get(user_id)
+        if entry is None:
+            return
+        _, known, liked = entry
+        known.add(post_id)
+        if is_liked:
+            liked.add(post_id)
+        else:
+            liked.discard(post_id)
+
+    async def annotate(self, user_id: int, posts):
+        """ Renseigne post.is_liked pour une liste de posts (PostResponse) """
+        liked = await self.liked(user_id, [post.id for post in posts])
+        for post in posts:
+            post.is_liked = post.id in liked
+        return posts
+
+    @property
+    def info(self):
+        return {**self.stats, "users": len(self.users)}
+
+
+liked_posts = LikedPostsCache()
+
+
+#Methode qui gere le like et le delike pour un post précis
+@router.post("/{post_id}/")
+async def toggle_like(post_id: int, current_user=Depends(get_current_user)):
+    # Like et compteur changent dans la même transaction ; le compteur est incrémenté en SQL (pas de like perdu)
+    async with in_transaction() as conn:
+        is_liked = await toggle(current_user.id, post_id, conn)
+        likes_count = await add_likes(post_id, 1 if is_liked else -1, conn)
+        if likes_count is None:
+            # L'exception annule aussi le like
+            raise HTTPException(status_code=404, detail="Post not found")
+    liked_posts.set(current_user.id, post_id, is_liked)
+
+    return {
+        "post_id": post_id,
+        "is_liked": is_liked,
+        "likes_count": likes_count
+    }
+
+
+#methode qui indique, pour plusieurs posts d'un coup, si l'utilisateur actuel les a likés (affichage d'un fil)
+@router.get("/liked")
+async def get_liked_posts(post_ids: List[int] = Query(...), current_user=Depends(get_current_user)):
+    if len(post_ids) > 200:
+        raise HTTPException(status_code=400, detail="Too many post ids (max 200)")
+    liked = await liked_posts.liked(current_user.id, post_ids)
+    return {"liked": {post_id: post_id in liked for post_id in post_ids}}
+
+
+#methode qui retourne la liste des personnes ayant liké un post précis (par pages, du plus ancien like au plus récent)
+@router.get("/{post_id}/users/", response_model=LikerPage)
+async def get_likers(post_id: int, page: Page = Depends(page_params)):
+    likes, next_cursor = await paginate(Like.filter(material_id=post_id, is_liked=True), page, ("id",))
+
+    users = {user["id"]: user for user in await User.filter(id__in=[like.user_id for like in likes]).values("id", "username", "name")}
+    likers = [users[like.user_id] for like in likes if like.user_id in users]
+
+    return {
+        "post_id": post_id,
+        "items": likers,
+        "next_cursor": next_cursor
+    }
+
+#methode qui indique si l'utilisateur actuel a deja like un post
+@router.get("/{post_id}/user/liked")
+async def get_liker(post_id: int, current_user=Depends(get_current_user)):
+    if not await PostModel.filter(id=post_id).exists():
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    # Vérifiez si l'utilisateur a déjà liké ce post
+    return {
+        "post_id": post_id,
+        "is_liked": post_id in await liked_posts.liked(current_user.id, [post_id])
+    }
@@ -1,39 +1,32 @@
 # app/notifications.py
 from email_validator import validate_email, EmailNotValidError
-import smtplib
-from email.mime.text import MIMEText
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from app.models import Notification
-from app.schemas import NotificationCreate, NotificationResponse
+from app.schemas import NotificationCreate, NotificationResponse, NotificationPage
 from app.auth import get_current_user
+from app.mailer import mailer
+from app.pagination import Page, page_params, paginate
 from datetime import datetime
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
 ## Send mail notifications
 def send_email_notification(to_email: str, subject: str, message: str):
+    """ Valide l'adresse puis dépose l'email dans la file d'envoi (non bloquant) """
     try:
         # Valider l'email
-        valid = validate_email(to_email)
+        valid = validate_email(to_email, check_deliverability=False)
         to_email = valid.email
 
-        # Configuration de l'email
-        msg = MIMEText(message)
-        msg['Subject'] = subject
-        msg['From'] = "tsakeuflora@gmail.com"
-        msg['To'] = to_email
-
-        # Envoi de l'email
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login("tsakeuflora@gmail.com", "obij btxo roik jeru")
-            server.send_message(msg)
+        # L'envoi SMTP est fait en arrière-plan par app.mailer
+        return mailer.enqueue(to_email, subject, message)
 
     except EmailNotValidError as e:
         print(f"Invalid email: {e}")
     except Exception as e:
-        print(f"Failed to send email: {e}")
+        print(f"Failed to queue email: {e}")
+    return False
 
 
 
@@ -79,8 +72,8 @@ async def delete_notification(notification_id: int, current_user=Depends(get_cur
     await notification.delete()
     return {"msg": "Notification deleted successfully"}
 
-# lister les notifications de l'utilisateur connecte
-@router.get("/", response_model=list[NotificationResponse])
-async def get_notifications(current_user=Depends(get_current_user)):
-    notifications = await Notification.filter(user=current_user).order_by('-date')
-    return notifications
+# lister les notifications de l'utilisateur connecte (par pages)
+@router.get("/", response_model=NotificationPage)
+async def get_notifications(page: Page = Depends(page_params), current_user=Depends(get_current_user)):
+    notifications, next_cursor = await paginate(Notification.filter(user=current_user), page, ("-date", "-id"))
+    return {"items": notifications, "next_cursor": next_cursor}
@@ -1,49 +1,72 @@
 # app/routers/orders.py
+import asyncio
+import uuid
 from collections import defaultdict
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from tortoise.expressions import F, Q
+from tortoise.transactions import in_transaction
 from app.models import Product, Order
-from app.schemas import OrderCreate, OrderResponse
+from app.schemas import OrderCreate, OrderResponse, OrderPage, OrdersValidate, CartCheckout
 from app.auth import get_current_seller, get_current_user
-from app.routes.notifications import send_email_notification
-import os
-from fpdf import FPDF  # Pour générer le PDF
+from app.notifier import notifier
+from app.invoices import invoices
+from app.idempotency import idempotency, no_commit
+from app.storage import storage, legacy_storage, object_response
+from app.pagination import Page, page_params, paginate
+from app.catalog import catalog_cache
 
 router = APIRouter()
 
-# Passer une commande
+# Passer une commande (en-tête Idempotency-Key accepté : une requête renvoyée ne crée pas de doublon)
 @router.post("/orders/", response_model=OrderResponse)
-async def create_order(order: OrderCreate, current_user=Depends(get_current_user)):
+async def create_order(order: OrderCreate, request: Request, current_user=Depends(get_current_user)):
+    return await idempotency.run(request, current_user, lambda commit: place_order(order, current_user, commit))
+
+
+async def place_order(order: OrderCreate, current_user, commit=no_commit):
+    if order.quantity <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
     product = await Product.filter(id=order.product_id).prefetch_related("seller").first()
     # product = await Product.filter(id=order.product_id).first()
     
-    if not product or product.stock < order.quantity:
+    if not product:
         raise HTTPException(status_code=400, detail="Product not available or insufficient stock")
 
+    # Stock réservé à la commande, comme pour le panier : la validation ne le décompte plus
     total_price = product.price * order.quantity
-    new_order = await Order.create(product=product, user=current_user, quantity=order.quantity, total_price=total_price)
+    try:
+        async with in_transaction() as conn:
+            if not await reserve_stock(product.id, order.quantity, conn):
+                raise OrderConflict("Insufficient stock")
+            new_order = await Order.create(product=product, user=current_user, quantity=order.quantity,
+                                           total_price=total_price, stock_reserved=True, using_db=conn)
+            response = OrderResponse.from_orm(new_order)
+            # Réponse Idempotency-Key validée avec la commande
+            await commit(response, conn)
+    except OrderConflict:
+        raise HTTPException(status_code=400, detail="Product not available or insufficient stock")
+    catalog_cache.invalidate()  # stock réservé
 
-    # Envoyer l'email au vendeur
-    send_email_notification(product.seller.email, "New Order Received", "You have a new order.")
+    # Notifier le vendeur (regroupé dans le digest)
+    notifier.notify(product.seller, "order_created", "New Order Received", f"You have a new order for {product.name}. Order ID: {new_order.id}")
 
     # Envoyer un email de confirmation au client
-    send_email_notification(current_user.email, "Order Confirmation", f"Your order has been placed. Order ID: {new_order.id}")
+    notifier.notify(current_user, "order_confirmed", "Order Confirmation", f"Your order has been placed. Order ID: {new_order.id}")
 
-    return new_order
+    return response
 
 
 # Liste des commandes passées par un utilisateur
-@router.get("/orders/", response_model=list[OrderResponse])
-async def get_user_orders(current_user=Depends(get_current_user)):
-    orders = await Order.filter(user=current_user).order_by("-id").all()
-    print(orders)
-    return orders
+@router.get("/orders/", response_model=OrderPage)
+async def get_user_orders(page: Page = Depends(page_params), current_user=Depends(get_current_user)):
+    orders, next_cursor = await paginate(Order.filter(user=current_user), page, ("-id",))
+    return {"items": orders, "next_cursor": next_cursor}
 
 # Liste des commandes passées par un utilisateur
-@router.get("/orders/all", response_model=list[OrderResponse])
-async def get_user_orders(current_user=Depends(get_current_user)):
-    orders = await Order.filter(product__seller=current_user).exclude(user=current_user).order_by("-id").all()
-    print(orders)
-    return orders
+@router.get("/orders/all", response_model=OrderPage)
+async def get_user_orders(page: Page = Depends(page_params), current_user=Depends(get_current_user)):
+    orders, next_cursor = await paginate(Order.filter(product__seller=current_user).exclude(user=current_user), page, ("-id",))
+    return {"items": orders, "next_cursor": next_cursor}
 
 # Annuler une commande
 @router.patch("/orders/{order_id}", dependencies=[Depends(get_current_user)])
@@ -53,32 +76,39 @@ async def cancel_order(order_id: int, current_user=Depends(get_current_user)):
     if not order:
         raise HTTPException(status_code=404, detail="Order not found or cannot be canceled")
 
-    order.status = "canceled"
-    await order.save()
+    if not await close_order(order, "canceled"):
+        raise HTTPException(status_code=404, detail="Order not found or cannot be canceled")
 
     # Envoyer un email de notification au vendeur
-    send_email_notification(order.product.seller.email, "Order Canceled", "An order has been canceled.")
+    notifier.notify(order.product.seller, "order_canceled", "Order Canceled", f"An order has been canceled. Order ID: {order.id}")
 
     return {"msg": "Order canceled successfully"}
 
 # Valid money transaction
 @router.patch("/orders/{order_id}/pay", dependencies=[Depends(get_current_user)])
-async def pay_order(order_id: int, current_user=Depends(get_current_user)):
+async def pay_order(order_id: int, request: Request, current_user=Depends(get_current_user)):
+    return await idempotency.run(request, current_user, lambda commit: mark_paid(order_id, current_user, commit))
+
+
+async def mark_paid(order_id: int, current_user, commit=no_commit):
     order = await Order.filter(id=order_id, user=current_user).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    order.payed = True
-    await order.save()
+    response = {"msg": "Order payed successfully"}
+    async with in_transaction() as conn:
+        order.payed = True
+        await order.save(using_db=conn)
+        await commit(response, conn)
 
-    return {"msg": "Order payed successfully"}
+    return response
 
 
-# Liste des commandes en attente pour les produits d'un vendeur
-@router.get("/orders/pending/", response_model=list[OrderResponse])
-async def get_pending_orders(current_user=Depends(get_current_user)):
-    orders = await Order.filter(product__seller=current_user, status="pending").prefetch_related("product").all()
-    return orders
+# Liste des commandes en attente pour les produits d'un vendeur (les plus anciennes d'abord)
+@router.get("/orders/pending/", response_model=OrderPage)
+async def get_pending_orders(page: Page = Depends(page_params), current_user=Depends(get_current_user)):
+    orders, next_cursor = await paginate(Order.filter(product__seller=current_user, status="pending"), page, ("id",))
+    return {"items": orders, "next_cursor": next_cursor}
 
 
 # Refuser une commande (c'est le vendeur qui peut refuser)
@@ -88,50 +118,186 @@ async def reject_order(order_id: int, current_user=Depends(get_current_user)):
     if not order:
         raise HTTPException(status_code=404, detail="Order not found or not owned by you")
     
-    order.status = "rejected"
-    await order.save()
+    if not await close_order(order, "rejected"):
+        raise HTTPException(status_code=409, detail="Order status changed, try again")
     return {"msg": "Order rejected successfully"}
 
 
 
+# Réservation du stock : un seul UPDATE conditionnel, sans lecture préalable
+async def reserve_stock(product_id: int, quantity: int, using_db=None) -> bool:
+    """ stock -= quantity si le stock suffit ; False sinon (rien n'est modifié) """
+    updated = await Product.filter(id=product_id, stock__gte=quantity).using_db(using_db).update(stock=F("stock") - quantity)
+    return updated == 1
+
+
+async def release_stock(product_id: int, quantity: int, using_db=None):
+    """ Remet en stock la quantité d'une commande annulée ou refusée """
+    await Product.filter(id=product_id).using_db(using_db).update(stock=F("stock") + quantity)
+
+
+def holds_stock(order: Order) -> bool:
+    """ Le stock de la commande est-il décompté ? (réservé au panier, ou pris à la validation) """
+    return order.status == "validated" or (order.status == "pending" and order.stock_reserved)
+
+
+async def close_order(order: Order, status: str) -> bool:
+    """ Passe la commande à canceled / rejected et rend le stock qu'elle tenait ; False si son statut a changé entre-temps """
+    async with in_transaction() as conn:
+        moved = await Order.filter(id=order.id, status=order.status).using_db(conn).update(status=status)
+        if not moved:
+            return False
+        if holds_stock(order):
+            await release_stock(order.product_id, order.quantity, conn)
+    if holds_stock(order):
+        catalog_cache.invalidate()  # stock rendu
+    order.status = status
+    return True
+
+
+class OrderConflict(Exception):
+    """ Transition de statut impossible (commande déjà traitée, stock insuffisant) """
+
+
+async def validate_pending(order: Order):
+    """ pending -> validated et décrément du stock dans la même transaction ; lève OrderConflict sinon """
+    async with in_transaction() as conn:
+        moved = await Order.filter(id=order.id, status="pending").using_db(conn).update(status="validated", invoice_status="pending")
+        if not moved:
+            raise OrderConflict("Order is no longer pending")
+        # Commande passée par le panier : le stock a déjà été pris
+        if not order.stock_reserved and not await reserve_stock(order.product_id, order.quantity, conn):
+            # L'exception annule la transaction : la commande reste en attente
+            raise OrderConflict("Insufficient stock")
+    if not order.stock_reserved:
+        catalog_cache.invalidate()  # stock décompté
+    order.status = "validated"
+    order.invoice_status = "pending"
+
+
+# Panier : plusieurs produits commandés en une requête
+@router.post("/orders/checkout", response_model=list[OrderResponse])
+async def checkout(cart: CartCheckout, request: Request, current_user=Depends(get_current_user)):
+    return await idempotency.run(request, current_user, lambda commit: checkout_cart(cart, current_user, commit))
+
+
+async def checkout_cart(cart: CartCheckout, current_user, commit=no_commit):
+    quantities = defaultdict(int)
+    for item in cart.items:
+        if item.quantity <= 0:
+            raise HTTPException(status_code=400, detail="Quantity must be positive")
+        quantities[item.product_id] += item.quantity
+    if not quantities:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    # Tous les produits (et leurs vendeurs) en une seule requête
+    products = {product.id: product for product in await Product.filter(id__in=list(quantities)).prefetch_related("seller")}
+    missing = [product_id for product_id in quantities if product_id not in products]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Products not available: {missing}")
+
+    # Le stock de tout le panier est réservé dans une transaction : tout ou rien
+    checkout_id = uuid.uuid4().hex
+    try:
+        async with in_transaction() as conn:
+            # Ordre fixe des produits : deux paniers concurrents ne s'interbloquent pas
+            for product_id in sorted(quantities):
+                if not await reserve_stock(product_id, quantities[product_id], conn):
+                    raise OrderConflict(f"Insufficient stock for product {product_id}")
+            await Order.bulk_create([
+                Order(product_id=product_id, user_id=current_user.id, quantity=quantity,
+                      total_price=products[product_id].price * quantity, checkout_id=checkout_id, stock_reserved=True)
+                for product_id, quantity in quantities.items()
+            ], using_db=conn)
+            # bulk_create ne renvoie pas les id : relecture par checkout_id
+            orders = await Order.filter(checkout_id=checkout_id).using_db(conn).order_by("id")
+            response = [OrderResponse.from_orm(order) for order in orders]
+            await commit(response, conn)
+    except OrderConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    catalog_cache.invalidate()  # stock réservé
+
+    # Une notification par vendeur pour toutes ses lignes du panier, une pour l'acheteur
+    by_seller = defaultdict(list)
+    for order in orders:
+        by_seller[products[order.product_id].seller.id].append(order)
+    for seller_orders in by_seller.values():
+        seller = products[seller_orders[0].product_id].seller
+        lines = "\n".join(f"- {products[order.product_id].name} x{order.quantity} (Order ID: {order.id})" for order in seller_orders)
+        notifier.notify(seller, "order_created", "New Order Received", f"You have {len(seller_orders)} new order(s):\n{lines}")
+
+    lines = "\n".join(f"- {products[order.product_id].name} x{order.quantity} (Order ID: {order.id})" for order in orders)
+    total = sum(order.total_price for order in orders)
+    notifier.notify(current_user, "order_confirmed", "Order Confirmation", f"Your order has been placed:\n{lines}\nTotal: {total}")
+
+    return response
+
+
+# Validation groupée : les factures sont générées par lots dans le pool
+# (route déclarée avant /orders/{order_id}/validate)
+@router.patch("/orders/batch/validate", dependencies=[Depends(get_current_user)])
+async def validate_orders(payload: OrdersValidate, current_user=Depends(get_current_user)):
+    orders = await Order.filter(id__in=payload.order_ids, product__seller=current_user, status="pending")
+    if not orders:
+        raise HTTPException(status_code=404, detail="No pending order found for you")
+
+    validated, errors = [], {}
+    for order in orders:
+        try:
+            await validate_pending(order)
+            validated.append(order.id)
+        except OrderConflict as e:
+            errors[order.id] = str(e)
+    invoices.enqueue(validated)
+
+    return {
+        "msg": f"{len(validated)} orders validated successfully",
+        "validated": validated,
+        "skipped": [order_id for order_id in payload.order_ids if order_id not in validated],
+        "errors": errors,
+        "invoice_status": "pending",
+    }
+
+
 # Validation d'une commande
 @router.patch("/orders/{order_id}/validate", dependencies=[Depends(get_current_user)])
 async def validate_order(order_id: int, current_user=Depends(get_current_user)):
-    order = await Order.filter(id=order_id, product__seller=current_user).prefetch_related("product", "user").first()
+    order = await Order.filter(id=order_id, product__seller=current_user).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found or not owned by you")
-    
-    # Décrémenter le stock du produit
-    product = await Product.filter(id=order.product.id).prefetch_related("seller").first()
-    product.stock -= order.quantity
-    await product.save()
 
-    order.status = "validated"
-    await order.save()
-
-    # Générer le PDF de la commande
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.cell(200, 10, f"Buyer Name: {order.user.username}", ln=True)
-    pdf.cell(200, 10, f"Product Name: {product.name}", ln=True)
-    pdf.cell(200, 10, f"Quantity: {order.quantity}", ln=True)
-    pdf.cell(200, 10, f"Total Price: {order.total_price}", ln=True)
-    pdf.cell(200, 10, f"Seller Name: {product.seller.username}", ln=True)
-    pdf.cell(200, 10, f"Seller Email: {product.seller.email}", ln=True)
-    
-    # S'assurer que le dossier orders existe
-    os.makedirs("orders", exist_ok=True)
-    # Enregistrer le PDF
-    pdf_file_path = f"orders/{order.id}_invoice.pdf"
-    pdf.output(pdf_file_path)
+    # Statut et stock changent ensemble, de façon atomique : pas de survente sous validations concurrentes
+    try:
+        await validate_pending(order)
+    except OrderConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-    # Envoyer le PDF par email au client
-    send_email_notification(order.user.email, "Order Confirmation", f"Your order has been validated. Invoice: {pdf_file_path}")
+    # La facture est générée en arrière-plan ; l'acheteur est notifié quand le PDF est prêt
+    invoices.enqueue([order.id])
 
-    return {"msg": "Order validated successfully"}
+    return {"msg": "Order validated successfully", "invoice_status": order.invoice_status}
 
 
+# Télécharger la facture (acheteur ou vendeur) ; reprise possible avec Range, revalidation avec ETag
+@router.get("/orders/{order_id}/invoice")
+async def download_invoice(order_id: int, request: Request, current_user=Depends(get_current_user)):
+    order = await Order.filter(Q(user=current_user) | Q(product__seller=current_user), id=order_id).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if order.invoice_status in ("pending", "failed"):
+        raise HTTPException(status_code=409, detail=f"Invoice is {order.invoice_status}")
+
+    backend, obj = storage, None
+    if order.invoice_path:
+        obj = await asyncio.to_thread(storage.stat, order.invoice_path)
+    if obj is None:
+        # Factures générées avant le stockage partagé
+        backend = legacy_storage
+        obj = await asyncio.to_thread(legacy_storage.stat, f"{order.id}_invoice.pdf")
+    if obj is None:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    return object_response(request, backend, obj, "application/pdf", filename=f"invoice_{order.id}.pdf")
 
 
 ##### METHODES QUI COMMUNIQUE LES DONNÉES POUR LE TABLEAU DE BORD #####
@@ -1,8 +1,12 @@
 # app/routers/products.py
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from app.models import Product, Order
-from app.schemas import ProductCreate, ProductResponse, OrderResponse
+from app.schemas import ProductCreate, ProductResponse, ProductPage, OrderResponse, CatalogResponse
 from app.auth import get_current_seller, get_current_user
+from app.pagination import Page, page_params, paginate, paginate_ranked
+from app.search import search
+from app.catalog import SORTS, catalog_facets, catalog_cache
 
 router = APIRouter()
 
@@ -10,6 +14,8 @@ router = APIRouter()
 @router.post("/products/", response_model=ProductResponse)
 async def create_product(product: ProductCreate, current_user=Depends(get_current_user)):
     new_product = await Product.create(seller=current_user, **product.dict())
+    search.index_product(new_product)
+    catalog_cache.invalidate()
     return new_product
 
 # Suppression d'un produit
@@ -20,13 +26,50 @@ async def delete_product(product_id: int, current_user=Depends(get_current_user)
         raise HTTPException(status_code=404, detail="Product not found or not owned by you")
     
     await product.delete()
+    search.remove_product(product_id)
+    catalog_cache.invalidate()
     return {"msg": "Product deleted successfully"}
 
 # Liste des produits d'un vendeur
-@router.get("/products/", response_model=list[ProductResponse])
-async def get_products(current_user=Depends(get_current_user)):
-    products = await Product.filter(seller=current_user).all()
-    return products
+@router.get("/products/", response_model=ProductPage)
+async def get_products(page: Page = Depends(page_params), current_user=Depends(get_current_user)):
+    products, next_cursor = await paginate(Product.filter(seller=current_user), page, ("id",))
+    return {"items": products, "next_cursor": next_cursor}
+
+# Catalogue de tous les vendeurs : filtres (ville, prix, en stock), tri, pages et comptes par ville / tranche de prix
+# (déclarée avant /products/{product_id})
+@router.get("/products/catalog", response_model=CatalogResponse)
+async def get_catalog(city: Optional[str] = None, min_price: Optional[float] = None,
+                      max_price: Optional[float] = None, in_stock: bool = False, sort: str = "newest",
+                      page: Page = Depends(page_params)):
+    if sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort, expected one of: {', '.join(SORTS)}")
+
+    key = (city, min_price, max_price, in_stock, sort, page.cursor, page.limit)
+    catalog = catalog_cache.get(key)
+    if catalog is None:
+        generation = catalog_cache.generation
+        query = Product.all()
+        if min_price is not None:
+            query = query.filter(price__gte=min_price)
+        if max_price is not None:
+            query = query.filter(price__lte=max_price)
+        if in_stock:
+            query = query.filter(stock__gt=0)
+
+        items, next_cursor = await paginate(query.filter(city=city) if city else query, page, SORTS[sort])
+        catalog = {"items": items, "next_cursor": next_cursor, "facets": await catalog_facets(query, city)}
+        catalog_cache.put(key, catalog, generation)
+
+    return catalog
+
+# Rechercher des produits par nom, tous vendeurs confondus (du plus pertinent au moins pertinent, par pages)
+# (déclarée avant /products/{product_id})
+@router.get("/products/search/", response_model=ProductPage)
+async def search_products(q: str, page: Page = Depends(page_params), current_user=Depends(get_current_user)):
+    ids, next_cursor = await paginate_ranked(lambda offset, limit: search.search_products(q, offset, limit), page)
+    products = {product.id: product for product in await Product.filter(id__in=ids)}
+    return {"items": [products[product_id] for product_id in ids if product_id in products], "next_cursor": next_cursor}
 
 # Obtenir un produit specifique
 @router.get("/products/{product_id}", response_model=ProductResponse)
@@ -47,4 +90,6 @@ async def update_product(product_id: int, product: ProductCreate, current_user=D
     existing_product.price = product.price
     existing_product.stock = product.stock
     await existing_product.save()
+    search.index_product(existing_product)
+    catalog_cache.invalidate()
     return existing_product
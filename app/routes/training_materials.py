@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.models import TrainingMaterial
-from app.schemas import TrainingMaterialCreate, TrainingMaterialResponse
+from app.schemas import TrainingMaterialCreate, TrainingMaterialResponse, TrainingMaterialPage
 from app.auth import get_current_user, is_admin
+from app.pagination import Page, page_params, paginate
 
 router = APIRouter()
 
@@ -18,7 +19,7 @@ async def delete_training_material(material_id: int):
     await material.delete()
     return {"msg": "Training material deleted successfully"}
 
-@router.get("/training_materials/", response_model=list[TrainingMaterialResponse])
-async def get_training_materials():
-    materials = await TrainingMaterial.all()
-    return materials
\ No newline at end of file
+@router.get("/training_materials/", response_model=TrainingMaterialPage)
+async def get_training_materials(page: Page = Depends(page_params)):
+    materials, next_cursor = await paginate(TrainingMaterial.all(), page, ("id",))
+    return {"items": materials, "next_cursor": next_cursor}
\ No newline at end of file
@@ -2,11 +2,12 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import timedelta
 from app.models import User
-from app.schemas import UserCreate, Token, UserLogin, UserResponse
+from app.schemas import UserCreate, Token, UserLogin, UserResponse, UserPage
 from app.auth import hash_password, verify_password, create_access_token
 from app.config import ACCESS_TOKEN_EXPIRE_MINUTES
 from tortoise.expressions import Q
 from app.auth import get_current_user
+from app.pagination import Page, page_params, paginate
 
 router = APIRouter(prefix="/users", tags=["Utilisateurs"])
 
@@ -29,7 +30,8 @@ async def register(user: UserCreate):
         username=user.username,
         email=user.email,
         password=hashed_password,
-        status=user.status
+        status=user.status,
+        city=user.city
     )
 
     return {"msg": "Utilisateur créé avec succès", "id": new_user.id}
@@ -55,10 +57,10 @@ async def login(user: UserLogin):
     return {"user_id": user_id, "user_status": user_status,"access_token": access_token, "token_type": "bearer"}
 
 
-@router.get("/", response_model=list[UserResponse])
-async def get_users(current_user = Depends(get_current_user)):
-    users = await User.all()
-    return users
+@router.get("/", response_model=UserPage)
+async def get_users(page: Page = Depends(page_params), current_user = Depends(get_current_user)):
+    users, next_cursor = await paginate(User.all(), page, ("id",))
+    return {"items": users, "next_cursor": next_cursor}
 
 
 @router.get("/{user_id}", response_model=UserResponse)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional
 
 class UserCreate(BaseModel):
@@ -8,6 +8,7 @@ class UserCreate(BaseModel):
     email: EmailStr
     password: str
     status: str = "user"
+    city: Optional[str] = None
 
 class UserLogin(BaseModel):
     identifier: str
@@ -39,12 +40,45 @@ class ProductResponse(BaseModel):
     class Config:
         orm_mode = True
 
+# Pages des listes : items, et next_cursor à renvoyer en ?cursor= pour la page suivante (None sur la dernière)
+class ProductPage(BaseModel):
+    items: List[ProductResponse]
+    next_cursor: Optional[str] = None
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceBucket(BaseModel):
+    min: Optional[float] = None  # None : pas de borne
+    max: Optional[float] = None
+    count: int
+
+class CatalogFacets(BaseModel):
+    city: List[FacetCount]
+    price: List[PriceBucket]
+
+class CatalogResponse(BaseModel):
+    items: List[ProductResponse]
+    next_cursor: Optional[str] = None
+    facets: CatalogFacets
+
 class OrderCreate(BaseModel):
     user_id: int
     product_id: int
     quantity: int
     total_price: float
 
+class CartItem(BaseModel):
+    product_id: int
+    quantity: int
+
+class CartCheckout(BaseModel):
+    items: List[CartItem]
+
+class OrdersValidate(BaseModel):
+    order_ids: List[int]
+
 class OrderResponse(BaseModel):
     id: int
     product_id: int
@@ -53,9 +87,16 @@ class OrderResponse(BaseModel):
     status: str
     total_price: float
     created_at: datetime
+    invoice_status: Optional[str] = None
+    checkout_id: Optional[str] = None
 
     class Config:
         orm_mode = True
+        from_attributes = True  # nom de orm_mode avec Pydantic 2 (OrderResponse.from_orm)
+
+class OrderPage(BaseModel):
+    items: List[OrderResponse]
+    next_cursor: Optional[str] = None
 
 class PostCreate(BaseModel):
     product_id: int
@@ -71,10 +112,15 @@ class PostResponse(BaseModel):
     type: str
     date : datetime
     likes_count : int
+    is_liked : Optional[bool] = None  # renseigné pour l'utilisateur connecté dans les listes
 
     class Config:
         orm_mode = True
 
+class PostPage(BaseModel):
+    items: List[PostResponse]
+    next_cursor: Optional[str] = None
+
 
 class TrainingMaterialCreate(BaseModel):
     title: str
@@ -103,6 +149,10 @@ class TrainingMaterialResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class TrainingMaterialPage(BaseModel):
+    items: List[TrainingMaterialResponse]
+    next_cursor: Optional[str] = None
+
 
 
 class NotificationCreate(BaseModel):
@@ -116,6 +166,21 @@ class UserResponse(BaseModel):
     username: str
     email: EmailStr
     status: str = "user"
+    city: Optional[str] = None
+
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+class Liker(BaseModel):
+    id: int
+    username: str
+    name: str
+
+class LikerPage(BaseModel):
+    post_id: int
+    items: List[Liker]
+    next_cursor: Optional[str] = None
 
 class NotificationResponse(BaseModel):
     id: int
@@ -125,6 +190,10 @@ class NotificationResponse(BaseModel):
     date : datetime
     read_at : Optional[datetime]
 
+class NotificationPage(BaseModel):
+    items: List[NotificationResponse]
+    next_cursor: Optional[str] = None
+
 class VideoFormationCreate(BaseModel):
     link : str
     user_id: int
@@ -146,4 +215,11 @@ class FormationResponse(BaseModel):
     description : str
     type : str
     date : datetime
-    read_at : datetime
\ No newline at end of file
+    read_at : datetime
+
+class PredictionAggregate(BaseModel):
+    day: date
+    predicted_class: str
+    city: Optional[str] = None
+    count: int
+    average_confidence: float
@@ -0,0 +1,271 @@
+# app/search.py
+import bisect
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from tortoise import Tortoise
+from app.config import SEARCH_BACKEND
+from app.models import Post, Product
+
+# Le nom du produit compte plus que la description du post
+NAME_WEIGHT = 2.0
+# Un mot de la recherche qui n'est que le début d'un mot indexé ("caca" -> "cacao")
+PREFIX_WEIGHT = 0.5
+PREFIX_MIN_LENGTH = 3
+
+STOPWORDS = {
+    "a", "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "elle", "en", "est", "et", "il", "je", "la",
+    "le", "les", "leur", "lui", "ma", "mais", "me", "mes", "mon", "ne", "nos", "notre", "nous", "on", "ou", "par",
+    "pas", "pour", "qu", "que", "qui", "sa", "se", "ses", "son", "sur", "ta", "te", "tes", "ton", "tu", "un", "une",
+    "vos", "votre", "vous", "d", "l", "j", "c", "n", "s", "t", "y",
+}
+
+
+def normalize(text: str) -> str:
+    """ Minuscules, sans accents : "Fève Séchée" -> "feve sechee" """
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def stem(token: str) -> str:
+    # Pluriels courants : "feves" -> "feve", "noix" reste "noix"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    if len(token) > 4 and token.endswith("aux"):
+        return token[:-3] + "al"
+    return token
+
+
+def tokenize(text: str) -> list:
+    return [stem(token) for token in re.findall(r"[a-z0-9]+", normalize(text)) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """ Index inversé en mémoire : mot -> {document: occurrences}, avec le vocabulaire trié pour les préfixes """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = {}  # id -> Counter des mots
+        self.vocabulary = []  # mots triés
+
+    def add(self, doc_id: int, text: str):
+        self.remove(doc_id)
+        terms = Counter(tokenize(text))
+        self.documents[doc_id] = terms
+        for term, count in terms.items():
+            if term not in self.postings:
+                bisect.insort(self.vocabulary, term)
+            self.postings[term][doc_id] = count
+
+    def remove(self, doc_id: int):
+        for term in self.documents.pop(doc_id, ()):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+
+    def expand(self, term: str):
+        """ (mot indexé, poids) : le mot exact, puis les mots qui commencent par lui """
+        if term in self.postings:
+            yield term, 1.0
+        if len(term) >= PREFIX_MIN_LENGTH:
+            start = bisect.bisect_right(self.vocabulary, term)
+            for candidate in self.vocabulary[start:]:
+                if not candidate.startswith(term):
+                    break
+                yield candidate, PREFIX_WEIGHT
+
+    def scores(self, terms) -> dict:
+        """ Score tf-idf de chaque document qui contient au moins un des mots """
+        scores = defaultdict(float)
+        total = len(self.documents) or 1
+        for term in terms:
+            for indexed, weight in self.expand(term):
+                postings = self.postings[indexed]
+                idf = math.log(1 + total / len(postings))
+                for doc_id, count in postings.items():
+                    scores[doc_id] += weight * idf * count / (count + 1)
+        return scores
+
+
+class SearchService:
+    """
+    Recherche de posts (description + nom du produit) et de produits (nom).
+
+    Avec PostgreSQL, la recherche utilise les index GIN créés au démarrage
+    (tsvector 'french' et trigrammes, sans accents via unaccent). Sinon
+    (SQLite, tests, extensions indisponibles), un index inversé en mémoire est
+    construit au démarrage puis tenu à jour par les routes posts et produits ;
+    il ne voit que les écritures du processus courant.
+    """
+
+    def __init__(self, backend: str = SEARCH_BACKEND):
+        self.requested = backend
+        self.backend = None
+        self.clear()
+
+    def clear(self):
+        self.posts = InvertedIndex()  # description des posts
+        self.products = InvertedIndex()  # nom des produits
+        self.post_product = {}  # post_id -> product_id
+        self.post_type = {}  # post_id -> "image" / "video"
+        self.product_posts = defaultdict(set)  # product_id -> posts
+
+    async def start(self):
+        conn = Tortoise.get_connection("default")
+        self.backend = "memory"
+        if self.requested in ("auto", "postgres") and conn.capabilities.dialect == "postgres":
+            try:
+                await setup_postgres(conn)
+                self.backend = "postgres"
+            except Exception as e:
+                if self.requested == "postgres":
+                    raise
+                print(f"PostgreSQL search unavailable, using the in-memory index: {e}")
+        if self.backend == "memory":
+            await self.rebuild()
+        print(f"Search backend: {self.backend}")
+
+    async def rebuild(self):
+        """ Index en mémoire construit depuis la base (au démarrage) """
+        self.clear()
+        for product in await Product.all().values("id", "name"):
+            self.products.add(product["id"], product["name"])
+        for post in await Post.all().values("id", "product_id", "description", "type"):
+            self._add_post(post["id"], post["product_id"], post["description"], post["type"])
+
+    ## Mise à jour de l'index en mémoire (sans effet avec PostgreSQL)
+
+    def index_post(self, post: Post):
+        if self.backend == "memory":
+            self._add_post(post.id, post.product_id, post.description, post.type)
+
+    def _add_post(self, post_id, product_id, description, post_type):
+        self.remove_post(post_id)
+        self.posts.add(post_id, description)
+        self.post_product[post_id] = product_id
+        self.post_type[post_id] = post_type
+        self.product_posts[product_id].add(post_id)
+
+    def remove_post(self, post_id: int):
+        if self.backend != "memory":
+            return
+        self.posts.remove(post_id)
+        product_id = self.post_product.pop(post_id, None)
+        self.post_type.pop(post_id, None)
+        if product_id is not None:
+            self.product_posts[product_id].discard(post_id)
+
+    def index_product(self, product: Product):
+        if self.backend == "memory":
+            self.products.add(product.id, product.name)
+
+    def remove_product(self, product_id: int):
+        """ Le produit et ses posts (supprimés en cascade) """
+        if self.backend != "memory":
+            return
+        self.products.remove(product_id)
+        for post_id in list(self.product_posts.pop(product_id, ())):
+            self.remove_post(post_id)
+
+    ## Recherche
+
+    async def search_posts(self, query: str, post_type: str = None, offset: int = 0, limit: int = 20) -> list:
+        """ Ids des posts les plus pertinents, du plus pertinent au moins pertinent """
+        if self.backend == "postgres":
+            return await search_posts_postgres(query, post_type, offset, limit)
+        terms = tokenize(query)
+        scores = self.posts.scores(terms)
+        for product_id, score in self.products.scores(terms).items():
+            for post_id in self.product_posts.get(product_id, ()):
+                scores[post_id] += NAME_WEIGHT * score
+        ranked = sorted(
+            (post_id for post_id in scores if post_type is None or self.post_type.get(post_id) == post_type),
+            key=lambda post_id: (-scores[post_id], -post_id),
+        )
+        return ranked[offset:offset + limit]
+
+    async def search_products(self, query: str, offset: int = 0, limit: int = 20) -> list:
+        if self.backend == "postgres":
+            return await search_products_postgres(query, offset, limit)
+        scores = self.products.scores(tokenize(query))
+        return sorted(scores, key=lambda product_id: (-scores[product_id], -product_id))[offset:offset + limit]
+
+    @property
+    def info(self):
+        return {
+            "backend": self.backend,
+            "posts": len(self.posts.documents),
+            "products": len(self.products.documents),
+            "terms": len(self.posts.vocabulary) + len(self.products.vocabulary),
+        }
+
+
+## PostgreSQL : index GIN (tsvector et trigrammes) sur des expressions sans accents
+
+# unaccent n'est pas IMMUTABLE : une fonction qui l'enveloppe est nécessaire pour l'utiliser dans un index
+POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE OR REPLACE FUNCTION search_unaccent(text) RETURNS text AS "
+    "$$ SELECT public.unaccent('public.unaccent', lower($1)) $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT",
+    "CREATE INDEX IF NOT EXISTS idx_posts_description_fts ON posts "
+    "USING GIN (to_tsvector('french', search_unaccent(description)))",
+    "CREATE INDEX IF NOT EXISTS idx_products_name_fts ON products USING GIN (to_tsvector('french', search_unaccent(name)))",
+    "CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING GIN (search_unaccent(name) gin_trgm_ops)",
+]
+
+# Produits trouvés par mots (tsvector) ou par ressemblance (trigrammes : fautes de frappe, mots partiels)
+MATCHED_PRODUCTS_SQL = """
+    SELECT pr.id, ts_rank(to_tsvector('french', search_unaccent(pr.name)), q.query)
+                  + similarity(search_unaccent(pr.name), q.text) AS score
+    FROM products pr, q
+    WHERE to_tsvector('french', search_unaccent(pr.name)) @@ q.query OR search_unaccent(pr.name) % q.text
+"""
+
+SEARCH_POSTS_SQL = f"""
+WITH q AS (SELECT plainto_tsquery('french', search_unaccent($1)) AS query, search_unaccent($1) AS text),
+matched_products AS ({MATCHED_PRODUCTS_SQL}),
+matched_posts AS (
+    SELECT p.id, ts_rank(to_tsvector('french', search_unaccent(p.description)), q.query) AS score
+    FROM posts p, q
+    WHERE to_tsvector('french', search_unaccent(p.description)) @@ q.query
+)
+SELECT p.id, COALESCE(mp.score, 0) + {NAME_WEIGHT} * COALESCE(mpr.score, 0) AS rank
+FROM posts p
+LEFT JOIN matched_posts mp ON mp.id = p.id
+LEFT JOIN matched_products mpr ON mpr.id = p.product_id
+WHERE (mp.id IS NOT NULL OR mpr.id IS NOT NULL) AND ($2::text IS NULL OR p.type = $2)
+ORDER BY rank DESC, p.id DESC
+LIMIT $3 OFFSET $4
+"""
+
+SEARCH_PRODUCTS_SQL = f"""
+WITH q AS (SELECT plainto_tsquery('french', search_unaccent($1)) AS query, search_unaccent($1) AS text),
+matched_products AS ({MATCHED_PRODUCTS_SQL})
+SELECT id, score FROM matched_products
+ORDER BY score DESC, id DESC
+LIMIT $2 OFFSET $3
+"""
+
+
+async def setup_postgres(conn):
+    for sql in POSTGRES_SETUP:
+        await conn.execute_script(sql)
+
+
+async def search_posts_postgres(query, post_type, offset, limit):
+    conn = Tortoise.get_connection("default")
+    rows = await conn.execute_query_dict(SEARCH_POSTS_SQL, [query, post_type, limit, offset])
+    return [row["id"] for row in rows]
+
+
+async def search_products_postgres(query, offset, limit):
+    conn = Tortoise.get_connection("default")
+    rows = await conn.execute_query_dict(SEARCH_PRODUCTS_SQL, [query, limit, offset])
+    return [row["id"] for row in rows]
+
+
+search = SearchService()
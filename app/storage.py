@@ -0,0 +1,167 @@
+# app/storage.py
+import hashlib
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from email.utils import formatdate
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from app.config import STORAGE_BACKEND, STORAGE_DIR, INVOICE_DIR
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    etag: str
+    last_modified: float  # timestamp
+
+
+class LocalStorage:
+    """
+    Stockage de fichiers avec une interface de type object store (put / stat /
+    iter_range / delete) sur un dossier local.
+
+    Les clés sont réparties dans des sous-dossiers (hash de la clé) pour ne pas
+    accumuler des milliers de fichiers dans un seul dossier ; shard_depth=0
+    garde la clé telle quelle (ancien dossier orders/).
+    """
+
+    def __init__(self, root: str = STORAGE_DIR, shard_depth: int = 2):
+        self.root = root
+        self.shard_depth = shard_depth
+
+    def path(self, key: str) -> str:
+        parts = [part for part in key.split("/") if part not in ("", ".", "..")]
+        if self.shard_depth:
+            digest = hashlib.sha1(key.encode()).hexdigest()
+            shards = [digest[2 * i:2 * i + 2] for i in range(self.shard_depth)]
+            parts = parts[:-1] + shards + parts[-1:]
+        return os.path.join(self.root, *parts)
+
+    def put(self, key: str, data: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Fichier temporaire unique par écriture : deux rendus de la même clé ne partagent pas le même .tmp
+        # (uuid plutôt que mkstemp : mêmes permissions que les autres fichiers, mkstemp crée en 0600)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "xb") as f:
+                f.write(data)
+            os.replace(tmp, path)  # jamais de fichier à moitié écrit
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        return self.stat(key)
+
+    def stat(self, key: str):
+        """ Métadonnées de l'objet, ou None s'il n'existe pas """
+        try:
+            st = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        etag = '"%x-%x"' % (st.st_size, st.st_mtime_ns)
+        return StoredObject(key=key, size=st.st_size, etag=etag, last_modified=st.st_mtime)
+
+    def iter_range(self, key: str, start: int = 0, end: int = None, chunk_size: int = 64 * 1024):
+        """ Contenu de l'octet start à end (inclus), par morceaux """
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+def get_storage(backend: str = STORAGE_BACKEND):
+    if backend == "local":
+        return LocalStorage(STORAGE_DIR)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+storage = get_storage()
+# Factures écrites avant le stockage partagé : orders/{id}_invoice.pdf
+legacy_storage = LocalStorage(INVOICE_DIR, shard_depth=0)
+
+
+## Réponses HTTP (ETag, Range, Cache-Control)
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int):
+    """ (début, fin) inclus d'un en-tête Range à un seul intervalle ; None si absent ou ignoré, ValueError si invalide """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None  # plusieurs intervalles ou autre unité : réponse complète
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError(header)
+    if not first:
+        # bytes=-N : les N derniers octets
+        length = int(last)
+        if length == 0 or size == 0:
+            # Objet vide : aucun octet à renvoyer (416, Content-Range: bytes */0)
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def object_response(request: Request, backend, obj: StoredObject, media_type: str, filename: str = None,
+                    cache_control: str = "private, max-age=31536000, immutable"):
+    """ Réponse en streaming avec revalidation (If-None-Match) et reprise (Range / If-Range) """
+    headers = {
+        "ETag": obj.etag,
+        "Last-Modified": formatdate(obj.last_modified, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, obj.etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range : l'intervalle n'est servi que si le fichier n'a pas changé depuis le début du téléchargement
+    if range_header and (not if_range or if_range.strip() == obj.etag):
+        try:
+            byte_range = parse_range(range_header, obj.size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{obj.size}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(obj.size)
+        return StreamingResponse(backend.iter_range(obj.key), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{obj.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(backend.iter_range(obj.key, start, end), status_code=206, media_type=media_type,
+                             headers=headers)
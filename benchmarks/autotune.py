@@ -0,0 +1,172 @@
+"""
+Cherche le meilleur réglage d'inférence sur la machine courante : threads par
+interpréteur, XNNPACK, taille max des batches et nombre d'interpréteurs,
+mesurés à plusieurs niveaux de requêtes simultanées (débit, latence p50/p99,
+mémoire RSS).
+
+    python -m benchmarks.autotune --model model.tflite
+    python -m benchmarks.autotune --reference   # modèle NumPy généré, sans TFLite
+
+Chaque réglage tourne dans un sous-processus avec les variables
+d'environnement correspondantes, en passant par le même code que l'API
+(pool d'interpréteurs + batcher). Le meilleur réglage est écrit dans
+inference_tuning.json (voir INFERENCE_TUNING_FILE), lu au démarrage.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+
+def synthetic_images(count, size):
+    rng = np.random.default_rng(42)
+    return [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+
+
+async def measure(handle, images, concurrency, requests):
+    """ `concurrency` clients envoient chacun leurs images l'une après l'autre """
+    latencies = []
+
+    async def client(share):
+        for i in range(share):
+            start = time.perf_counter()
+            await handle.submit(images[i % len(images)])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    shares = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(share) for share in shares if share))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "throughput": requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def run_child(args):
+    """ Un réglage (fixé par l'environnement) mesuré à chaque niveau de concurrence """
+    from app.routes.disease_detection import load_handle
+
+    async def main():
+        handle = await asyncio.to_thread(load_handle, args.model_file)
+        try:
+            images = synthetic_images(16, handle.input_size)
+            await measure(handle, images, 1, 4)  # chauffe
+            return [await measure(handle, images, level, args.requests) for level in args.concurrency]
+        finally:
+            await handle.close()
+
+    levels = asyncio.run(main())
+    print(json.dumps({
+        "levels": levels,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def score(result, target, max_p99):
+    """ Débit au niveau de concurrence visé ; 0 si la latence p99 dépasse la limite """
+    level = next(level for level in result["levels"] if level["concurrency"] == target)
+    if max_p99 and level["p99_ms"] > max_p99:
+        return 0.0
+    return level["throughput"]
+
+
+def parse_list(value, cast=int):
+    return [cast(v) for v in value.split(",") if v]
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", help="fichier .tflite (MODEL_PATH par défaut)")
+    parser.add_argument("--reference", action="store_true", help="générer un modèle NumPy de référence")
+    parser.add_argument("--threads", type=parse_list, default=sorted({1, 2, 4} & set(range(1, cpus + 1))) or [1])
+    parser.add_argument("--xnnpack", type=lambda v: [x == "on" for x in v.split(",")], default=[True, False],
+                        help="on,off")
+    parser.add_argument("--batch-sizes", type=parse_list, default=[1, 4, 8, 16])
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 8, 32])
+    parser.add_argument("--target", type=int, help="concurrence visée pour choisir le réglage (défaut : la plus haute)")
+    parser.add_argument("--max-p99-ms", type=float, help="écarter les réglages plus lents au p99")
+    parser.add_argument("--requests", type=int, default=128, help="requêtes par niveau de concurrence")
+    parser.add_argument("--output", default=os.getenv("INFERENCE_TUNING_FILE", "inference_tuning.json"))
+    parser.add_argument("--dry-run", action="store_true", help="afficher les mesures sans écrire le fichier")
+    # Options internes du sous-processus
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--model-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    env = dict(os.environ, INFERENCE_TUNING_FILE="", INFERENCE_WORKER_ADDRESS="")
+    if args.reference:
+        from app.ml.backends import create_reference_model
+        model = create_reference_model(os.path.join(tempfile.mkdtemp(prefix="autotune_"), "reference.npz"))
+        env["INFERENCE_BACKEND"] = "numpy"
+        args.xnnpack = [True]  # sans objet pour le backend NumPy
+    else:
+        model = args.model or os.getenv("MODEL_PATH", "model.tflite")
+    target = args.target or max(args.concurrency)
+    if target not in args.concurrency:
+        args.concurrency.append(target)
+
+    results = []
+    print(f"{'threads':>7} {'xnnpack':>7} {'batch':>5} {'pool':>4} {'conc':>4} {'img/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>7}")
+    for threads, xnnpack, batch_size in itertools.product(args.threads, args.xnnpack, args.batch_sizes):
+        # Autant d'interpréteurs que de cœurs disponibles pour ce nombre de threads
+        config = {
+            "num_threads": threads,
+            "xnnpack": xnnpack,
+            "max_batch_size": batch_size,
+            "pool_size": max(1, cpus // threads),
+        }
+        child_env = dict(env, INFERENCE_NUM_THREADS=str(threads), INFERENCE_XNNPACK="1" if xnnpack else "0",
+                         INFERENCE_MAX_BATCH_SIZE=str(batch_size), INFERENCE_POOL_SIZE=str(config["pool_size"]))
+        cmd = [sys.executable, "-m", "benchmarks.autotune", "--child", "--model-file", model,
+               "--requests", str(args.requests), "--concurrency", ",".join(map(str, args.concurrency))]
+        proc = subprocess.run(cmd, capture_output=True, text=True, env=child_env)
+        if proc.returncode != 0:
+            print(f"{threads:7} {str(xnnpack):>7} {batch_size:5} skipped: {proc.stderr.strip().splitlines()[-1]}")
+            continue
+
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append((config, result))
+        for level in result["levels"]:
+            print(f"{threads:7} {str(xnnpack):>7} {batch_size:5} {config['pool_size']:4} {level['concurrency']:4} "
+                  f"{level['throughput']:8.1f} {level['p50_ms']:8.2f} {level['p99_ms']:8.2f} {result['rss_mb']:7.1f}")
+
+    if not results:
+        sys.exit("No configuration could be measured")
+
+    best_config, best = max(results, key=lambda item: score(item[1], target, args.max_p99_ms))
+    if score(best, target, args.max_p99_ms) == 0:
+        sys.exit(f"No configuration meets p99 <= {args.max_p99_ms} ms at concurrency {target}")
+    print(f"\nBest at concurrency {target}: {best_config}")
+
+    if args.dry_run:
+        return
+    with open(args.output, "w") as f:
+        json.dump({
+            "config": best_config,
+            "model": os.path.basename(model),
+            "backend": env.get("INFERENCE_BACKEND", "auto"),
+            "cpus": cpus,
+            "target_concurrency": target,
+            "max_p99_ms": args.max_p99_ms,
+            "measurements": best,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }, f, indent=2)
+    print(f"Written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
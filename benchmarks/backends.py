@@ -0,0 +1,122 @@
+"""
+Compare les runtimes d'inférence (tflite_runtime, tensorflow, numpy) et les
+précisions du modèle (float32, float16, int8) sur CPU : latence p50/p99,
+mémoire (RSS max), temps d'import et écart des prédictions par rapport au
+modèle float32.
+
+    python -m benchmarks.backends --model float32=model.tflite --model int8=model_int8.tflite
+    python -m benchmarks.backends --reference   # modèles NumPy générés, sans TFLite
+
+Chaque combinaison tourne dans un sous-processus pour mesurer la mémoire
+et le coût d'import de façon isolée.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+
+def synthetic_images(count, size=(224, 224)):
+    rng = np.random.default_rng(42)
+    return [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+
+
+def run_child(args):
+    """ Mesures pour un couple (backend, modèle) ; écrit les prédictions dans args.output """
+    from app.ml.backends import resolve_backend
+    from app.routes.disease_detection import predict_images
+
+    start = time.perf_counter()
+    backend, Interpreter = resolve_backend(args.backend)
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    interpreter = Interpreter(model_path=args.model_file, num_threads=args.threads)
+    interpreter.allocate_tensors()
+    load_seconds = time.perf_counter() - start
+
+    shape = interpreter.get_input_details()[0]['shape']
+    images = synthetic_images(args.images, (int(shape[2]), int(shape[1])))
+    predict_images(interpreter, images[:1])  # chauffe
+
+    latencies, outputs = [], []
+    for _ in range(args.runs):
+        for pixels in images:
+            start = time.perf_counter()
+            outputs.append(predict_images(interpreter, [pixels])[0])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    np.save(args.output, np.array(outputs[:len(images)]))
+    print(json.dumps({
+        "backend": backend,
+        "import_s": import_seconds,
+        "load_s": load_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", action="append", default=[], help="precision=chemin, ex. int8=model_int8.tflite")
+    parser.add_argument("--backends", default="tflite_runtime,tensorflow,numpy")
+    parser.add_argument("--reference", action="store_true", help="générer des modèles NumPy float32/float16/int8")
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=1)
+    # Options internes du sous-processus
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--model-file", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    workdir = tempfile.mkdtemp(prefix="bench_backends_")
+    models = dict(spec.split("=", 1) for spec in args.model)
+    if args.reference:
+        from app.ml.backends import create_reference_model
+        for precision in ("float32", "float16", "int8"):
+            models[f"numpy-{precision}"] = create_reference_model(os.path.join(workdir, f"{precision}.npz"), precision=precision)
+
+    results, baseline = [], {}
+    for precision, model_path in models.items():
+        for backend in args.backends.split(","):
+            # Les modèles .npz ne tournent que sur le backend numpy, et inversement
+            if (backend == "numpy") != model_path.endswith(".npz"):
+                continue
+            output = os.path.join(workdir, f"{backend}-{precision}.npy")
+            cmd = [sys.executable, "-m", "benchmarks.backends", "--child", "--backend", backend,
+                   "--model-file", model_path, "--output", output, "--images", str(args.images),
+                   "--runs", str(args.runs), "--threads", str(args.threads)]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{backend:15} {precision:15} skipped: {proc.stderr.strip().splitlines()[-1]}")
+                continue
+
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            predictions = np.load(output)
+            # Référence : première exécution float32 du même type de modèle
+            family = "numpy" if backend == "numpy" else "tflite"
+            reference = baseline.setdefault(family, predictions) if "float32" in precision else baseline.get(family)
+            if reference is not None:
+                result["max_abs_diff"] = float(np.max(np.abs(predictions - reference)))
+                result["top1_agreement"] = float(np.mean(predictions.argmax(1) == reference.argmax(1)))
+            results.append((backend, precision, result))
+
+    print(f"{'backend':15} {'model':15} {'import s':>9} {'load s':>7} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'|Δp| max':>9} {'top-1':>6}")
+    for backend, precision, r in results:
+        print(f"{backend:15} {precision:15} {r['import_s']:9.2f} {r['load_s']:7.2f} {r['p50_ms']:8.2f} {r['p99_ms']:8.2f} "
+              f"{r['rss_mb']:8.1f} {r.get('max_abs_diff', float('nan')):9.4f} {r.get('top1_agreement', float('nan')):6.2f}")
+
+
+if __name__ == "__main__":
+    main()
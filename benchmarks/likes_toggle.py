@@ -0,0 +1,117 @@
+"""
+Likes concurrents sur un post très sollicité : compare l'ancien toggle_like
+(lecture du like et du post, save() du like, compteur calculé en Python) et
+l'upsert actuel avec incrément atomique du compteur.
+
+    python -m benchmarks.likes_toggle --users 200 --rounds 3 --concurrency 50
+    DATABASE_URL=postgres://... python -m benchmarks.likes_toggle
+
+Chaque utilisateur bascule son like `rounds` fois. Par défaut une base SQLite
+temporaire est utilisée. Les tables sont créées avec generate_schemas : ne pas
+pointer vers une base de production.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from tortoise import Tortoise
+from benchmarks.stock_oversell import count_queries
+
+
+async def legacy_toggle(user_id, post_id):
+    """ Ancienne version de toggle_like (app/routes/posts.py) """
+    from app.models import Like, Post
+    existing_like = await Like.filter(user_id=user_id, material_id=post_id).first()
+    post = await Post.filter(id=post_id).first()
+    if existing_like:
+        existing_like.is_liked = not existing_like.is_liked
+        await existing_like.save()
+        if existing_like.is_liked:
+            post.likes_count += 1
+        else:
+            post.likes_count -= 1
+    else:
+        await Like.create(user_id=user_id, material_id=post_id, is_liked=True)
+        post.likes_count += 1
+    await post.save()
+
+
+async def upsert_toggle(user_id, post_id):
+    """ toggle_like actuel, sans la couche HTTP """
+    from tortoise.transactions import in_transaction
+    from app.routes.likes import toggle, add_likes
+    async with in_transaction() as conn:
+        is_liked = await toggle(user_id, post_id, conn)
+        await add_likes(post_id, 1 if is_liked else -1, conn)
+
+
+async def run(label, toggle, args, counter):
+    from app.models import Like, Post, Product, User
+
+    seller = await User.create(name=label, email=f"{label}@example.com", username=label, password="x", status="farmer")
+    product = await Product.create(seller=seller, name="cacao", price=2.5, city="Douala", stock=1)
+    post = await Post.create(product=product, link="x", description="hot post", type="image")
+    user_ids = list(range(1, args.users + 1))  # les likes ne référencent pas la table users
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    errors = 0
+
+    async def worker(user_id):
+        nonlocal errors
+        for _ in range(args.rounds):
+            async with semaphore:
+                try:
+                    await toggle(user_id, post.id)
+                except Exception:
+                    errors += 1
+
+    counter.queries = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(user_id) for user_id in user_ids))
+    elapsed = time.perf_counter() - start
+
+    await post.refresh_from_db()
+    liked = await Like.filter(material_id=post.id, is_liked=True).count()
+    toggles = args.users * args.rounds
+    return {
+        "label": label,
+        "likes_count": post.likes_count,
+        "liked_rows": liked,
+        "rows": await Like.filter(material_id=post.id).count(),
+        "drift": post.likes_count - liked,
+        "errors": errors,
+        "toggles_per_s": toggles / elapsed,
+        "queries_per_toggle": counter.queries / toggles,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3, help="bascules par utilisateur")
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL") or f"sqlite://{os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')}"
+    await Tortoise.init(db_url=db_url, modules={"models": ["app.models"]})
+    await Tortoise.generate_schemas()
+    counter = count_queries()
+
+    try:
+        rows = [
+            await run(f"legacy{os.getpid()}", legacy_toggle, args, counter),
+            await run(f"upsert{os.getpid()}", upsert_toggle, args, counter),
+        ]
+    finally:
+        await Tortoise.close_connections()
+
+    print(f"users={args.users} rounds={args.rounds} concurrency={args.concurrency} db={db_url.split(':')[0]}")
+    print(f"{'version':8} {'count':>6} {'liked':>6} {'rows':>5} {'drift':>6} {'errors':>6} {'toggles/s':>10} {'queries':>8}")
+    for r in rows:
+        print(f"{r['label'][:6]:8} {r['likes_count']:6} {r['liked_rows']:6} {r['rows']:5} {r['drift']:6} {r['errors']:6} "
+              f"{r['toggles_per_s']:10.1f} {r['queries_per_toggle']:8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
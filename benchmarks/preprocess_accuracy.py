@@ -0,0 +1,82 @@
+"""
+Vérifie que le chemin de prétraitement rapide (draft JPEG, filtre configurable,
+normalisation dans le tenseur d'entrée) donne les mêmes prédictions que
+l'ancien chemin (décodage complet, LANCZOS, division par 255).
+
+    python -m benchmarks.preprocess_accuracy [dossier_images] [--tolerance 0.05]
+
+Sans dossier, des photos JPEG synthétiques de 3000x4000 sont générées.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+from app.routes import disease_detection as dd
+
+
+def legacy_preprocess(image, target_size):
+    """Ancien prétraitement, conservé comme référence."""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = image.resize(target_size, Image.LANCZOS)
+    image_array = np.array(image, dtype=np.float32)
+    image_array = image_array / 255.0
+    return np.expand_dims(image_array, axis=0)
+
+
+def load_images(folder):
+    if folder:
+        for name in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, name), "rb") as f:
+                yield name, f.read()
+        return
+
+    rng = np.random.default_rng(0)
+    for i in range(8):
+        # Dégradé + bruit : proche d'une photo de téléphone une fois compressé en JPEG
+        y, x = np.mgrid[0:3000, 0:4000]
+        base = np.stack([x % 256, y % 256, (x + y) % 256], axis=-1).astype(np.float32)
+        noisy = np.clip(base + rng.normal(0, 20, base.shape), 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(noisy).save(buffer, format="JPEG", quality=90)
+        yield f"synthetic_{i}.jpg", buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="écart max toléré sur les probabilités")
+    args = parser.parse_args()
+
+    worst, agree, total = 0.0, 0, 0
+    legacy_time, fast_time = 0.0, 0.0
+    model = dd.load_model_sync()
+    with model.pool.acquire() as interpreter:
+        for name, data in load_images(args.folder):
+            start = time.perf_counter()
+            reference_input = legacy_preprocess(Image.open(io.BytesIO(data)), model.input_size)
+            legacy_time += time.perf_counter() - start
+            reference = dd.predict_with_tflite(interpreter, reference_input)[0]
+
+            start = time.perf_counter()
+            pixels = dd.decode_image(Image.open(io.BytesIO(data)), model.input_size)
+            fast_time += time.perf_counter() - start
+            fast = dd.predict_images(interpreter, [pixels])[0]
+
+            diff = float(np.max(np.abs(reference - fast)))
+            worst = max(worst, diff)
+            agree += int(np.argmax(reference) == np.argmax(fast))
+            total += 1
+            print(f"{name}: max |Δp| = {diff:.4f}")
+
+    print(f"images: {total}, top-1 agreement: {agree}/{total}, worst |Δp|: {worst:.4f}")
+    print(f"preprocess time: legacy {legacy_time / total * 1000:.1f} ms, fast {fast_time / total * 1000:.1f} ms per image")
+    if worst > args.tolerance or agree != total:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
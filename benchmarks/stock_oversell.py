@@ -0,0 +1,130 @@
+"""
+Validations concurrentes sur un seul produit : vérifie qu'il n'y a pas de
+survente et compare le débit avec l'ancienne validation (lecture du stock en
+Python puis save()).
+
+    python -m benchmarks.stock_oversell --stock 100 --orders 300 --concurrency 50
+    DATABASE_URL=postgres://... python -m benchmarks.stock_oversell
+
+Par défaut une base SQLite temporaire est utilisée. Les tables sont créées
+avec generate_schemas : ne pas pointer vers une base de production.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from tortoise import Tortoise
+
+
+async def legacy_validate(order_id):
+    """ Ancienne version de validate_order : lecture du stock, calcul en Python, save() """
+    from app.models import Order, Product
+    order = await Order.filter(id=order_id).prefetch_related("product", "user").first()
+    product = await Product.filter(id=order.product.id).prefetch_related("seller").first()
+    if product.stock < order.quantity:
+        raise ValueError("Insufficient stock")
+    product.stock -= order.quantity
+    await product.save()
+    order.status = "validated"
+    await order.save()
+
+
+async def atomic_validate(order_id):
+    """ validate_order actuel : une lecture de la commande puis la transaction conditionnelle """
+    from app.models import Order
+    from app.routes.orders import validate_pending
+    order = await Order.filter(id=order_id).first()
+    await validate_pending(order)
+
+
+class QueryCounter(logging.Handler):
+    """ Compte les requêtes SQL journalisées par Tortoise (logger tortoise.db_client, niveau DEBUG) """
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.queries = 0
+
+    def emit(self, record):
+        self.queries += 1
+
+
+def count_queries():
+    counter = QueryCounter()
+    logger = logging.getLogger("tortoise.db_client")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logger.addHandler(counter)
+    return counter
+
+
+async def run(label, validate, args, counter):
+    from app.models import Order, Product, User
+
+    seller = await User.create(name=label, email=f"{label}@example.com", username=label, password="x", status="farmer")
+    product = await Product.create(seller=seller, name="cacao", price=2.5, city="Douala", stock=args.stock)
+    orders = await Order.bulk_create([
+        Order(product_id=product.id, user_id=seller.id, quantity=1, total_price=2.5) for _ in range(args.orders)
+    ])
+    orders = await Order.filter(product_id=product.id).values_list("id", flat=True)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = {"validated": 0, "rejected": 0}
+
+    async def worker(order):
+        async with semaphore:
+            try:
+                await validate(order)
+                results["validated"] += 1
+            except Exception:
+                results["rejected"] += 1
+
+    counter.queries = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(order) for order in orders))
+    elapsed = time.perf_counter() - start
+
+    await product.refresh_from_db()
+    validated = await Order.filter(product_id=product.id, status="validated").count()
+    sold = args.stock - product.stock
+    return {
+        "label": label,
+        "validated": validated,
+        "final_stock": product.stock,
+        "oversold": max(0, validated - args.stock),
+        "lost_updates": validated - sold,
+        "orders_per_s": len(orders) / elapsed,
+        "queries_per_order": counter.queries / len(orders),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stock", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    db_url = os.getenv("DATABASE_URL") or f"sqlite://{os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')}"
+    await Tortoise.init(db_url=db_url, modules={"models": ["app.models"]})
+    await Tortoise.generate_schemas()
+    counter = count_queries()
+
+    try:
+        rows = [
+            await run(f"legacy{os.getpid()}", legacy_validate, args, counter),
+            await run(f"atomic{os.getpid()}", atomic_validate, args, counter),
+        ]
+    finally:
+        await Tortoise.close_connections()
+
+    print(f"stock={args.stock} orders={args.orders} concurrency={args.concurrency} db={db_url.split(':')[0]}")
+    print(f"{'version':8} {'validated':>9} {'stock':>6} {'oversold':>8} {'lost upd':>8} {'orders/s':>9} {'queries':>8}")
+    for r in rows:
+        print(f"{r['label'][:6]:8} {r['validated']:9} {r['final_stock']:6} {r['oversold']:8} {r['lost_updates']:8} "
+              f"{r['orders_per_s']:9.1f} {r['queries_per_order']:8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# Le paquet app est importé depuis la racine du dépôt, quel que soit le dossier de lancement
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
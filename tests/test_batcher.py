@@ -0,0 +1,97 @@
+# tests/test_batcher.py
+import asyncio
+import numpy as np
+import pytest
+from app.ml.batcher import InferenceBatcher
+
+
+def double(items):
+    """ Faux modèle : une sortie (1,) par entrée, pour vérifier la tranche rendue à chaque appelant """
+    return np.array(items, dtype=np.float32).reshape(-1, 1) * 2
+
+
+def test_concurrent_requests_share_batches():
+    batcher = InferenceBatcher(double, max_batch_size=4, max_wait_ms=50)
+
+    async def main():
+        outputs = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        await batcher.stop()
+        return outputs
+
+    outputs = asyncio.run(main())
+    assert [output.tolist() for output in outputs] == [[[2.0 * i]] for i in range(10)]
+    assert batcher.stats["batch_sizes"] == {2: 1, 4: 2}
+    assert batcher.stats["items"] == 10 and batcher.stats["batches"] == 3
+
+
+def test_lone_request_leaves_after_max_wait():
+    batcher = InferenceBatcher(double, max_batch_size=8, max_wait_ms=20)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        output = await batcher.submit(3)
+        elapsed = loop.time() - started
+        await batcher.stop()
+        return output, elapsed
+
+    output, elapsed = asyncio.run(main())
+    assert output.tolist() == [[6.0]]
+    assert batcher.stats["batch_sizes"] == {1: 1}
+    assert 0.015 <= elapsed < 1
+
+
+def test_coroutine_run_batch_and_full_batch_without_wait():
+    calls = []
+
+    async def run_batch(items):
+        calls.append(len(items))
+        return double(items)
+
+    # Fenêtre très longue : un batch plein part sans l'attendre
+    batcher = InferenceBatcher(run_batch, max_batch_size=3, max_wait_ms=10_000)
+
+    async def main():
+        outputs = await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(3))), 1)
+        await batcher.stop()
+        return outputs
+
+    assert [output.tolist() for output in asyncio.run(main())] == [[[0.0]], [[2.0]], [[4.0]]]
+    assert calls == [3]
+
+
+def test_error_reaches_every_caller():
+    def broken(items):
+        raise RuntimeError("interpreter failed")
+
+    batcher = InferenceBatcher(broken, max_batch_size=4, max_wait_ms=10)
+
+    async def main():
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(main())
+    assert len(results) == 3 and all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_stop_cancels_pending_requests():
+
+    async def main():
+        release = asyncio.Event()
+
+        async def slow(items):
+            await release.wait()
+            return double(items)
+
+        batcher = InferenceBatcher(slow, max_batch_size=1, max_wait_ms=0)
+        first = asyncio.ensure_future(batcher.submit(1))
+        second = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0.01)
+        release.set()
+        await batcher.stop()
+        assert (await first).tolist() == [[2.0]]
+        with pytest.raises(asyncio.CancelledError):
+            await second
+
+    asyncio.run(main())
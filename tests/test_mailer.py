@@ -0,0 +1,108 @@
+# tests/test_mailer.py
+import asyncio
+import socket
+import time
+import pytest
+from aiosmtpd.controller import Controller
+from app.mailer import MailDispatcher
+
+
+class Inbox:
+    """ Handler aiosmtpd : refuse les `failures` premiers messages (451), garde les suivants """
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failures:
+            self.failures -= 1
+            return "451 Temporary failure"
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    def start(failures=0):
+        inbox = Inbox(failures)
+        controller = Controller(inbox, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        servers.append(controller)
+        return inbox, controller.port
+
+    servers = []
+    yield start
+    for controller in servers:
+        controller.stop()
+
+
+def dispatcher(port, **kwargs):
+    return MailDispatcher(host="127.0.0.1", port=port, user="", password="", starttls=False, timeout=5,
+                          sender="noreply@example.com", **kwargs)
+
+
+def test_retries_with_backoff(smtp):
+    inbox, port = smtp(failures=2)
+    mailer = dispatcher(port, max_retries=3, retry_backoff=0.05)
+
+    async def main():
+        started = time.monotonic()
+        assert mailer.enqueue("buyer@example.com", "Order", "placed")
+        await mailer.stop(timeout=5)
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(main())
+    assert len(inbox.messages) == 1
+    assert inbox.messages[0].rcpt_tos == ["buyer@example.com"]
+    assert mailer.stats["retried"] == 2 and mailer.stats["sent"] == 1 and mailer.stats["failed"] == 0
+    # Attentes de 0.05 puis 0.1 s entre les essais
+    assert elapsed >= 0.15
+
+
+def test_gives_up_after_max_retries(smtp):
+    inbox, port = smtp(failures=10)
+    mailer = dispatcher(port, max_retries=1, retry_backoff=0.01)
+
+    async def main():
+        mailer.enqueue("buyer@example.com", "Order", "placed")
+        await mailer.stop(timeout=5)
+
+    asyncio.run(main())
+    assert not inbox.messages
+    assert mailer.stats["retried"] == 1 and mailer.stats["failed"] == 1 and mailer.stats["sent"] == 0
+
+
+def test_stop_flushes_the_queue(smtp):
+    inbox, port = smtp()
+    mailer = dispatcher(port, workers=2)
+
+    async def main():
+        for i in range(20):
+            mailer.enqueue(f"user{i}@example.com", "Digest", f"message {i}")
+        await mailer.stop(timeout=5)
+        assert not mailer.running
+
+    asyncio.run(main())
+    assert sorted(message.rcpt_tos[0] for message in inbox.messages) == sorted(f"user{i}@example.com" for i in range(20))
+    assert mailer.stats["sent"] == 20
+
+
+def test_full_queue_drops(smtp):
+    inbox, port = smtp()
+    mailer = dispatcher(port, queue_size=1, workers=1)
+
+    async def main():
+        # Sans rendre la main à la boucle, le worker n'a encore rien retiré de la file
+        results = [mailer.enqueue("buyer@example.com", "Order", str(i)) for i in range(3)]
+        await mailer.stop(timeout=5)
+        return results
+
+    assert asyncio.run(main()) == [True, False, False]
+    assert mailer.stats["dropped"] == 2 and len(inbox.messages) == 1
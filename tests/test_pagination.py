@@ -0,0 +1,88 @@
+# tests/test_pagination.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import HTTPException
+from tortoise import Tortoise
+from app.models import TrainingMaterial
+from app.pagination import Page, decode_cursor, encode_cursor, paginate, paginate_ranked
+
+
+def with_db(test):
+    """ Exécute le test dans une base SQLite en mémoire """
+    async def main():
+        await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.models"]})
+        await Tortoise.generate_schemas()
+        try:
+            await test()
+        finally:
+            await Tortoise.close_connections()
+    asyncio.run(main())
+
+
+async def all_pages(query, ordering, limit):
+    """ Suit les curseurs jusqu'à la dernière page ; renvoie les ids page par page """
+    pages, cursor = [], None
+    while True:
+        rows, cursor = await paginate(query, Page(cursor=cursor, limit=limit), ordering)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    when = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    cursor = encode_cursor([when, 42])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, ("-created_at", "-id"), TrainingMaterial) == [when, 42]
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor([1, 2]), encode_cursor(["1"])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, ("id",), TrainingMaterial)
+    assert error.value.status_code == 400
+
+
+def test_pages_by_id():
+    async def test():
+        ids = [(await TrainingMaterial.create(title=f"m{i}", video_url="https://example.com/v")).id for i in range(7)]
+        assert await all_pages(TrainingMaterial.all(), ("id",), 3) == [ids[0:3], ids[3:6], ids[6:]]
+        assert await all_pages(TrainingMaterial.all(), ("-id",), 3) == [ids[6:3:-1], ids[3:0:-1], ids[:1]]
+        # Limite égale au nombre de lignes : pas de page vide à la fin
+        assert await all_pages(TrainingMaterial.all(), ("id",), 7) == [ids]
+    with_db(test)
+
+
+def test_pages_by_date_with_ties():
+    async def test():
+        base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        materials = []
+        for i in range(8):
+            material = await TrainingMaterial.create(title=f"m{i}", video_url="https://example.com/v")
+            # Plusieurs lignes à la même date : l'id départage
+            await TrainingMaterial.filter(id=material.id).update(created_at=base + timedelta(days=i // 3))
+            materials.append((base + timedelta(days=i // 3), material.id))
+
+        expected = [material_id for _, material_id in sorted(materials, reverse=True)]
+        pages = await all_pages(TrainingMaterial.all(), ("-created_at", "-id"), 3)
+        assert [len(page) for page in pages] == [3, 3, 2]
+        assert sum(pages, []) == expected
+    with_db(test)
+
+
+def test_ranked_pages():
+    ranking = list(range(100, 110))
+
+    async def search(offset, limit):
+        return ranking[offset:offset + limit]
+
+    async def main():
+        ids, cursor = await paginate_ranked(search, Page(cursor=None, limit=4))
+        pages = [ids]
+        while cursor is not None:
+            ids, cursor = await paginate_ranked(search, Page(cursor=cursor, limit=4))
+            pages.append(ids)
+        return pages
+
+    assert asyncio.run(main()) == [ranking[0:4], ranking[4:8], ranking[8:]]
@@ -0,0 +1,78 @@
+# tests/test_prediction_cache.py
+import asyncio
+import sqlite3
+import time
+import numpy as np
+from app.ml.cache import ENTRY_OVERHEAD, PredictionCache
+
+
+def predictions(value: float) -> np.ndarray:
+    return np.full((1, 4), value, dtype=np.float32)
+
+
+def test_lru_eviction_by_entries():
+    cache = PredictionCache(max_entries=2, max_bytes=1 << 20, ttl=60, db_path="")
+    cache.put("a", predictions(1), "healthy")
+    cache.put("b", predictions(2), "black_pod")
+    assert cache.get("a") is not None  # "a" devient la plus récente
+    cache.put("c", predictions(3), "healthy")
+
+    assert cache.get("b") is None
+    assert cache.get("a")[1] == "healthy" and cache.get("c") is not None
+    assert cache.stats["evictions"] == 1
+
+
+def test_eviction_by_bytes():
+    size = predictions(0).nbytes + 1 + ENTRY_OVERHEAD
+    cache = PredictionCache(max_entries=100, max_bytes=2 * size, ttl=60, db_path="")
+    for key in "abc":
+        cache.put(key, predictions(0), "healthy")
+
+    assert list(cache.entries) == ["b", "c"]
+    assert cache.bytes == 2 * size
+
+
+def test_expired_entries_are_dropped():
+    cache = PredictionCache(max_entries=10, max_bytes=1 << 20, ttl=60, db_path="")
+    cache.put("old", predictions(1), "healthy", expires_at=time.time() - 1)
+    cache.put("new", predictions(2), "healthy")
+
+    assert cache.get("old") is None and "old" not in cache.entries
+    assert cache.get("new") is not None
+
+
+def test_model_change_invalidates_memory_and_disk(tmp_path):
+    db_path = str(tmp_path / "predictions.sqlite3")
+
+    async def main():
+        cache = PredictionCache(max_entries=10, max_bytes=1 << 20, ttl=60, db_path=db_path)
+        cache.set_model("v1")
+        await cache.store("photo", predictions(1), "healthy")
+        # Résultat d'un modèle qui n'est plus actif : ignoré
+        await cache.store("stale", predictions(2), "healthy", model="v0")
+        assert cache.get("stale") is None
+
+        # Second niveau : relu après un redémarrage, tant que le modèle est le même
+        restarted = PredictionCache(max_entries=10, max_bytes=1 << 20, ttl=60, db_path=db_path)
+        restarted.set_model("v1")
+        found = await restarted.lookup("photo")
+        assert found is not None and found[1] == "healthy"
+        assert restarted.stats["disk_hits"] == 1
+
+        restarted.set_model("v2")
+        assert not restarted.entries
+        await asyncio.gather(*restarted.purges)
+        assert await restarted.lookup("photo") is None
+        assert restarted.stats["misses"] == 1
+
+    asyncio.run(main())
+    with sqlite3.connect(db_path) as db:
+        assert db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] == 0
+
+
+def test_same_model_keeps_entries():
+    cache = PredictionCache(max_entries=10, max_bytes=1 << 20, ttl=60, db_path="")
+    cache.set_model("v1")
+    cache.put("photo", predictions(1), "healthy")
+    cache.set_model("v1")
+    assert cache.get("photo") is not None